@@ -10,8 +10,15 @@ DB_NAME = os.getenv("DB_NAME", "wellness_tracker")
 client = AsyncIOMotorClient(MONGO_URI)
 db = client[DB_NAME]
 
-# Collections
+# Collections (used by app.repositories.mongo)
 users_collection = db["users"]
 blacklist_collection = db["token_blacklist"]
 habits_collection = db["habits"]
-habit_logs_collection = db["habit_logs"]
+habit_logs_collection = db["habit_logs"]  # legacy per-day logs, migrated into habit_log_buckets
+habit_buckets_collection = db["habit_log_buckets"]
+reminders_collection = db["reminders"]
+wellness_collection = db["wellness_logs"]
+wellness_sketches_collection = db["wellness_sketches"]
+wellness_archive_collection = db["wellness_archive"]
+ingest_keys_collection = db["ingest_keys"]
+analytics_cache_collection = db["analytics_cache"]
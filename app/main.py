@@ -1,8 +1,19 @@
+import asyncio
 from fastapi import FastAPI
+from app.storage import storage
+from app.utils.sketches import ensure_wellness_sketches
+from app.utils.cleanup import run_garbage_collector
+from app.utils.wellness_archive import run_wellness_archiver
+from app.utils.habit_migration import run_habit_log_migration
+from app.utils.profiling import LoopBlockMonitor, LOOP_BLOCK_THRESHOLD_MS, PROFILING_ENABLED, profile_request
 from app.routes import auth, users, habits, wellness, reminders, analytics
 
 app = FastAPI(title="Wellness & Habit Tracker")
 
+# Only installed when profiling is configured, so normal requests skip the middleware entirely
+if PROFILING_ENABLED:
+    app.middleware("http")(profile_request)
+
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(habits.router)
@@ -10,6 +21,17 @@ app.include_router(wellness.router)
 app.include_router(reminders.router)
 app.include_router(analytics.router)
 
+@app.on_event("startup")
+async def startup():
+    await storage.init()
+    await ensure_wellness_sketches()
+    app.state.gc_task = asyncio.create_task(run_garbage_collector())
+    app.state.archive_task = asyncio.create_task(run_wellness_archiver())
+    app.state.habit_migration_task = asyncio.create_task(run_habit_log_migration())
+    if LOOP_BLOCK_THRESHOLD_MS > 0:
+        app.state.loop_monitor = LoopBlockMonitor(LOOP_BLOCK_THRESHOLD_MS)
+        app.state.loop_monitor.start()
+
 @app.get("/")
 async def root():
     return {"msg": "Welcome to Wellness & Habit Tracker API"}
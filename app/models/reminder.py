@@ -14,7 +14,7 @@ class ReminderCreate(BaseModel):
             "example": {
                 "title": "Drink Water",
                 "reminder_type": "habit",
-                "target_id": "64fa12345",
+                "target_id": "64fa1234567890abcdef1234",
                 "reminder_time": "2025-10-21T15:30:00",
                 "repeat": "none"
             }
@@ -55,10 +55,14 @@ class ReminderResponse(BaseModel):
                 "user_id": "68b67cb62345c22e0e1b4b5e",
                 "title": "Drink Water",
                 "reminder_type": "habit",
-                "target_id": "64fa12345",
+                "target_id": "64fa1234567890abcdef1234",
                 "reminder_time": "2025-10-21T15:30:00",
                 "repeat": "none",
                 "created_at": "2025-10-21T11:27:30"
             }
         }
     )
+
+
+class UpcomingReminderResponse(ReminderResponse):
+    fire_at: datetime  # concrete occurrence (UTC); repeating reminders expand into several
@@ -17,8 +17,21 @@ class WellnessLogUpdate(BaseModel):
 class WellnessLogResponse(BaseModel):
     id: str
     user_id: str
-    sleep_hours: float
-    water_intake_liters: float
-    steps: int
-    mood: Optional[str]
+    sleep_hours: Optional[float] = None  # None when the day has no data for the metric (e.g. wearable-only days)
+    water_intake_liters: Optional[float] = None
+    steps: Optional[int] = None
+    mood: Optional[str] = None
     date: datetime
+    period: str = "day"  # "week" or "month" for rolled-up archive entries (values are daily averages)
+    days_logged: int = 1
+
+class WearableSample(BaseModel):
+    timestamp: datetime  # naive timestamps are taken as UTC
+    type: str = Field(..., pattern="^(steps|steps_total|sleep|water)$")  # steps_total is a cumulative daily counter
+    value: float = Field(..., ge=0, le=100000)  # steps, hours of sleep or liters of water
+
+class IngestResponse(BaseModel):
+    accepted: int
+    rejected: int
+    days_updated: list[str]
+    duplicate: bool = False
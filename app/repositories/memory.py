@@ -0,0 +1,571 @@
+import bisect
+import copy
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from bson import ObjectId
+from app.utils.habit_buckets import month_key, day_mask
+
+# In-process backend with the same interface as app.repositories.mongo. Every lookup the routes make
+# is served from a dict or a sorted index, so tests and microbenchmarks run without a MongoDB.
+# No method awaits part-way through, so each call is atomic on the event loop just like a single
+# Mongo operation. Documents are copied in and out so callers can't mutate stored state.
+
+INGEST_KEYS_PER_DAY = 100  # matches app.repositories.mongo
+
+
+def _copy(doc):
+    return copy.deepcopy(doc) if doc is not None else None
+
+
+def _project(doc: dict, fields):
+    if not fields:
+        return _copy(doc)
+    return {key: _copy(doc[key]) for key in ("_id", *fields) if key in doc}
+
+
+def _oid(value) -> ObjectId:
+    return value if isinstance(value, ObjectId) else ObjectId(value)
+
+
+class _SortedIndex:
+    """Keys per owner kept in sorted order, for range scans like (user_id, date)"""
+
+    def __init__(self):
+        self.keys = defaultdict(list)
+
+    def add(self, owner, key):
+        bisect.insort(self.keys[owner], key)
+
+    def remove(self, owner, key):
+        keys = self.keys.get(owner, [])
+        index = bisect.bisect_left(keys, key)
+        if index < len(keys) and keys[index] == key:
+            keys.pop(index)
+        if not keys:
+            self.keys.pop(owner, None)
+
+    def between(self, owner, start=None, end=None) -> list:
+        keys = self.keys.get(owner, [])
+        lo = bisect.bisect_left(keys, start) if start is not None else 0
+        hi = bisect.bisect_right(keys, end) if end is not None else len(keys)
+        return keys[lo:hi]
+
+
+async def _iterate(values):
+    for value in list(values):
+        yield value
+
+
+class UserRepository:
+    def __init__(self):
+        self.by_id = {}
+        self.by_email = {}
+
+    async def get(self, user_id: str):
+        return _copy(self.by_id.get(_oid(user_id)))
+
+    async def get_by_email(self, email: str):
+        return _copy(self.by_id.get(self.by_email.get(email)))
+
+    async def create(self, user: dict) -> str:
+        user = _copy(user)
+        user["_id"] = ObjectId()
+        self.by_id[user["_id"]] = user
+        self.by_email[user["email"]] = user["_id"]
+        return str(user["_id"])
+
+    async def update(self, user_id: str, fields: dict):
+        user = self.by_id.get(_oid(user_id))
+        if user is None:
+            return None
+        if "email" in fields:
+            self.by_email.pop(user["email"], None)
+            self.by_email[fields["email"]] = user["_id"]
+        user.update(_copy(fields))
+        return _copy(user)
+
+    async def delete(self, user_id: str):
+        user = self.by_id.pop(_oid(user_id), None)
+        if user:
+            self.by_email.pop(user["email"], None)
+
+    async def existing_ids(self, ids: list) -> set:
+        return {str(i) for i in ids if ObjectId.is_valid(str(i)) and _oid(i) in self.by_id}
+
+    async def init(self):
+        pass
+
+
+class TokenRepository:
+    def __init__(self):
+        self.tokens = set()
+        self.user_revocations = []
+
+    async def revoke(self, token: str):
+        self.tokens.add(token)
+
+    async def is_revoked(self, token: str) -> bool:
+        return token in self.tokens
+
+    async def revoke_user(self, user_id: str, reason: str):
+        self.user_revocations.append({"user_id": user_id, "reason": reason})
+
+    async def init(self):
+        pass
+
+
+class HabitRepository:
+    def __init__(self):
+        self.by_id = {}
+        self.by_user = defaultdict(dict)  # user_id -> {habit ObjectId: None}, insertion ordered
+
+    async def create(self, habit: dict) -> str:
+        habit = _copy(habit)
+        habit["_id"] = ObjectId()
+        self.by_id[habit["_id"]] = habit
+        self.by_user[habit["user_id"]][habit["_id"]] = None
+        return str(habit["_id"])
+
+    async def list_for_user(self, user_id: str, fields: list = None) -> list:
+        return [_project(self.by_id[i], fields) for i in self.by_user.get(user_id, {})]
+
+    def _owned(self, habit_id: str, user_id: str):
+        habit = self.by_id.get(_oid(habit_id))
+        return habit if habit and habit["user_id"] == user_id else None
+
+    async def get(self, habit_id: str, user_id: str):
+        return _copy(self._owned(habit_id, user_id))
+
+    async def update(self, habit_id: str, user_id: str, fields: dict):
+        habit = self._owned(habit_id, user_id)
+        if habit is None:
+            return None
+        habit.update(_copy(fields))
+        return _copy(habit)
+
+    def _remove(self, habit):
+        del self.by_id[habit["_id"]]
+        owned = self.by_user.get(habit["user_id"], {})
+        owned.pop(habit["_id"], None)
+        if not owned:
+            self.by_user.pop(habit["user_id"], None)
+
+    async def delete(self, habit_id: str, user_id: str) -> bool:
+        habit = self._owned(habit_id, user_id)
+        if habit is None:
+            return False
+        self._remove(habit)
+        return True
+
+    async def count_for_user(self, user_id: str) -> int:
+        return len(self.by_user.get(user_id, {}))
+
+    async def pop_batch_for_user(self, user_id: str, limit: int) -> list:
+        ids = list(self.by_user.get(user_id, {}))[:limit]
+        for habit_id in ids:
+            self._remove(self.by_id[habit_id])
+        return [str(i) for i in ids]
+
+    async def existing_ids(self, ids: list) -> set:
+        return {str(i) for i in ids if ObjectId.is_valid(str(i)) and _oid(i) in self.by_id}
+
+    def distinct_user_ids(self):
+        return _iterate(self.by_user)
+
+    async def init(self):
+        pass
+
+
+class HabitLogRepository:
+    def __init__(self):
+        self.buckets = {}  # (habit_id, month) -> bucket
+        self.by_user = _SortedIndex()  # user_id -> sorted (month, habit_id)
+        self.by_habit = defaultdict(set)  # habit_id -> months
+
+    async def log_completion(self, habit_id: str, user_id: str, day: date) -> bool:
+        key = (habit_id, month_key(day))
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = {"habit_id": habit_id, "user_id": user_id, "month": key[1], "bits": 0, "count": 0}
+            self.buckets[key] = bucket
+            self.by_user.add(user_id, (key[1], habit_id))
+            self.by_habit[habit_id].add(key[1])
+        if bucket["bits"] & day_mask(day):
+            return False
+        bucket["bits"] |= day_mask(day)
+        bucket["count"] += 1
+        return True
+
+    async def buckets_for_user(self, user_id: str, start_month: str = None, end_month: str = None) -> list:
+        keys = self.by_user.between(
+            user_id,
+            (start_month,) if start_month else None,
+            (end_month, "\uffff") if end_month else None
+        )
+        return [_copy(self.buckets[(habit_id, month)]) for month, habit_id in keys]
+
+    async def count_completed_on(self, user_id: str, day: date) -> int:
+        month, mask = month_key(day), day_mask(day)
+        return sum(
+            1 for _, habit_id in self.by_user.between(user_id, (month,), (month, "\uffff"))
+            if self.buckets[(habit_id, month)]["bits"] & mask
+        )
+
+    async def delete_for_habits(self, habit_ids: list):
+        for habit_id in habit_ids:
+            for month in self.by_habit.pop(habit_id, set()):
+                bucket = self.buckets.pop((habit_id, month))
+                self.by_user.remove(bucket["user_id"], (month, habit_id))
+
+    async def delete_for_user(self, user_id: str):
+        for month, habit_id in self.by_user.between(user_id):
+            self.buckets.pop((habit_id, month), None)
+            months = self.by_habit.get(habit_id, set())
+            months.discard(month)
+            if not months:
+                self.by_habit.pop(habit_id, None)
+        self.by_user.keys.pop(user_id, None)
+
+    def distinct_user_ids(self):
+        return _iterate(self.by_user.keys)
+
+    def distinct_habit_ids(self):
+        return _iterate(self.by_habit)
+
+    async def migrate_legacy(self) -> int:
+        return 0
+
+    async def init(self):
+        pass
+
+
+class WellnessLogRepository:
+    def __init__(self):
+        self.by_id = {}
+        self.by_user_date = {}  # (user_id, date) -> ObjectId
+        self.dates = _SortedIndex()  # user_id -> sorted dates
+
+    def _insert(self, log: dict):
+        self.by_id[log["_id"]] = log
+        self.by_user_date[(log["user_id"], log["date"])] = log["_id"]
+        self.dates.add(log["user_id"], log["date"])
+
+    def _remove(self, log: dict):
+        del self.by_id[log["_id"]]
+        self.by_user_date.pop((log["user_id"], log["date"]), None)
+        self.dates.remove(log["user_id"], log["date"])
+
+    async def get_by_date(self, user_id: str, day: str):
+        return _copy(self.by_id.get(self.by_user_date.get((user_id, day))))
+
+    async def create(self, log: dict):
+        if (log["user_id"], log["date"]) in self.by_user_date:
+            return None
+        log = _copy(log)
+        log["_id"] = ObjectId()
+        self._insert(log)
+        return str(log["_id"])
+
+    async def list_for_user(self, user_id: str, start: str = None, end: str = None, fields: list = None) -> list:
+        return [
+            _project(self.by_id[self.by_user_date[(user_id, day)]], fields)
+            for day in self.dates.between(user_id, start, end)
+        ]
+
+    def _owned(self, log_id: str, user_id: str):
+        log = self.by_id.get(_oid(log_id))
+        return log if log and log["user_id"] == user_id else None
+
+    async def update(self, log_id: str, user_id: str, fields: dict):
+        log = self._owned(log_id, user_id)
+        if log is None:
+            return None
+        before = _copy(log)
+        log.update(_copy(fields))
+        return before
+
+    async def delete(self, log_id: str, user_id: str):
+        log = self._owned(log_id, user_id)
+        if log is None:
+            return None
+        self._remove(log)
+        return log
+
+    async def merge_daily(self, user_id: str, day: str, inc: dict, maximums: dict, on_insert: dict, ingest_key: str = None):
+        log_id = self.by_user_date.get((user_id, day))
+        if ingest_key and log_id is not None and ingest_key in self.by_id[log_id].get("ingest_keys", []):
+            return False, None
+        if log_id is None:
+            log = {"_id": ObjectId(), "user_id": user_id, "date": day, **_copy(on_insert)}
+            self._insert(log)
+            before = None
+        else:
+            log = self.by_id[log_id]
+            before = _copy(log)
+        for field, value in inc.items():
+            log[field] = log.get(field, 0) + value
+        for field, value in maximums.items():
+            log[field] = max(log[field], value) if log.get(field) is not None else value
+        if ingest_key:
+            log["ingest_keys"] = (log.get("ingest_keys", []) + [ingest_key])[-INGEST_KEYS_PER_DAY:]
+        return True, before
+
+    async def pop_batch(self, user_id: str, limit: int) -> list:
+        batch = [self.by_id[self.by_user_date[(user_id, day)]] for day in self.dates.between(user_id)[:limit]]
+        for log in batch:
+            self._remove(log)
+        return batch
+
+    async def iter_all(self):
+        for log in list(self.by_id.values()):
+            yield _copy(log)
+
+    async def iter_before(self, day: str):
+        for user_id in sorted(self.dates.keys):
+            for log_date in self.dates.between(user_id, None, day):
+                if log_date < day:
+                    yield _copy(self.by_id[self.by_user_date[(user_id, log_date)]])
+
+    async def delete_range(self, user_id: str, start: str, end: str):
+        for day in self.dates.between(user_id, start, end):
+            if day < end:
+                self._remove(self.by_id[self.by_user_date[(user_id, day)]])
+
+    def distinct_user_ids(self):
+        return _iterate(self.dates.keys)
+
+    async def init(self):
+        pass
+
+
+class WellnessArchiveRepository:
+    def __init__(self):
+        self.summaries = {}  # (user_id, period, start) -> summary
+        self.starts = _SortedIndex()  # (user_id, period) -> sorted starts
+
+    async def save(self, user_id: str, summaries: list):
+        for period, start, fields in summaries:
+            key = (user_id, period, start)
+            if key not in self.summaries:
+                self.summaries[key] = {"_id": ObjectId(), "user_id": user_id, "period": period, "start": start}
+                self.starts.add((user_id, period), start)
+            self.summaries[key].update(_copy(fields))
+
+    async def list_for_user(self, user_id: str, period: str, start: str = None, end: str = None) -> list:
+        return [
+            _copy(self.summaries[(user_id, period, s)])
+            for s in self.starts.between((user_id, period), start, end)
+        ]
+
+    async def week_containing(self, user_id: str, day: str):
+        starts = self.starts.between((user_id, "week"), None, day)
+        if starts:
+            week = self.summaries[(user_id, "week", starts[-1])]
+            if week["end"] >= day:
+                return _copy(week)
+        return None
+
+    async def delete_for_user(self, user_id: str):
+        for period in ("week", "month"):
+            for start in self.starts.between((user_id, period)):
+                del self.summaries[(user_id, period, start)]
+            self.starts.keys.pop((user_id, period), None)
+
+    def distinct_user_ids(self):
+        return _iterate({user_id for user_id, _ in self.starts.keys})
+
+    async def init(self):
+        pass
+
+
+class SketchRepository:
+    def __init__(self):
+        self.days = {}
+
+    async def increment(self, increments: dict, upsert: bool = True):
+        for day, inc in increments.items():
+            if day not in self.days:
+                if not upsert:
+                    continue
+                self.days[day] = {"date": day}
+            sketch = self.days[day]
+            for field, delta in inc.items():
+                # Mirror Mongo's dotted paths, e.g. "steps.40"
+                target = sketch
+                *parents, leaf = field.split(".")
+                for parent in parents:
+                    target = target.setdefault(parent, {})
+                target[leaf] = target.get(leaf, 0) + delta
+
+    async def list_between(self, start: str, end: str) -> list:
+        return [_copy(sketch) for day, sketch in self.days.items() if start <= day <= end]
+
+    async def clear(self):
+        self.days.clear()
+
+    async def is_empty(self) -> bool:
+        return not self.days
+
+    async def init(self):
+        pass
+
+
+class ReminderRepository:
+    def __init__(self):
+        self.by_id = {}
+        self.fire_index = _SortedIndex()  # user_id -> sorted (next_fire_at, ObjectId)
+        self.by_target = defaultdict(set)
+
+    def _insert(self, reminder: dict):
+        self.by_id[reminder["_id"]] = reminder
+        self.fire_index.add(reminder["user_id"], (reminder["next_fire_at"], reminder["_id"]))
+        if reminder.get("target_id"):
+            self.by_target[reminder["target_id"]].add(reminder["_id"])
+
+    def _remove(self, reminder: dict):
+        del self.by_id[reminder["_id"]]
+        self.fire_index.remove(reminder["user_id"], (reminder["next_fire_at"], reminder["_id"]))
+        targets = self.by_target.get(reminder.get("target_id"), set())
+        targets.discard(reminder["_id"])
+        if not targets:
+            self.by_target.pop(reminder.get("target_id"), None)
+
+    async def create(self, reminder: dict) -> str:
+        reminder = _copy(reminder)
+        reminder["_id"] = ObjectId()
+        self._insert(reminder)
+        return str(reminder["_id"])
+
+    async def list_for_user(self, user_id: str) -> list:
+        return [_copy(self.by_id[i]) for _, i in self.fire_index.between(user_id)]
+
+    def _owned(self, reminder_id: str, user_id: str):
+        reminder = self.by_id.get(_oid(reminder_id))
+        return reminder if reminder and reminder["user_id"] == user_id else None
+
+    async def get(self, reminder_id: str, user_id: str):
+        return _copy(self._owned(reminder_id, user_id))
+
+    async def update(self, reminder_id: str, user_id: str, fields: dict):
+        reminder = self._owned(reminder_id, user_id)
+        if reminder is None:
+            return None
+        self._remove(reminder)
+        reminder.update(_copy(fields))
+        self._insert(reminder)
+        return _copy(reminder)
+
+    async def delete(self, reminder_id: str, user_id: str) -> bool:
+        reminder = self._owned(reminder_id, user_id)
+        if reminder is None:
+            return False
+        self._remove(reminder)
+        return True
+
+    async def one_off_between(self, user_id: str, start: datetime, end: datetime, limit: int) -> list:
+        result = []
+        for fire_at, reminder_id in self.fire_index.between(user_id, (start,), (end, ObjectId("f" * 24))):
+            reminder = self.by_id[reminder_id]
+            if reminder.get("repeat") not in ("daily", "weekly"):
+                result.append(_copy(reminder))
+                if len(result) >= limit:
+                    break
+        return result
+
+    async def repeating_for_user(self, user_id: str, end: datetime) -> list:
+        return [
+            _copy(self.by_id[reminder_id])
+            for _, reminder_id in self.fire_index.between(user_id)
+            if self.by_id[reminder_id].get("repeat") in ("daily", "weekly")
+            and self.by_id[reminder_id]["reminder_time"] <= end
+        ]
+
+    async def advance_many(self, updates: list):
+        for reminder_id, current, next_fire_at in updates:
+            reminder = self.by_id.get(_oid(reminder_id))
+            if reminder is None or reminder["next_fire_at"] != current:
+                continue
+            self._remove(reminder)
+            reminder["next_fire_at"] = next_fire_at
+            self._insert(reminder)
+
+    async def pop_batch(self, limit: int, user_id: str = None, habit_ids: list = None) -> list:
+        if user_id:
+            ids = [i for _, i in self.fire_index.between(user_id)[:limit]]
+        else:
+            ids = [
+                i for habit_id in habit_ids for i in self.by_target.get(habit_id, ())
+                if self.by_id[i]["reminder_type"] == "habit"
+            ][:limit]
+        for reminder_id in ids:
+            self._remove(self.by_id[reminder_id])
+        return [str(i) for i in ids]
+
+    def distinct_user_ids(self):
+        return _iterate(self.fire_index.keys)
+
+    def distinct_habit_targets(self):
+        return _iterate({
+            target for target, ids in self.by_target.items()
+            if any(self.by_id[i]["reminder_type"] == "habit" and self.by_id[i].get("target_verified") for i in ids)
+        })
+
+    async def migrate_legacy(self):
+        pass
+
+    async def init(self):
+        pass
+
+
+class AnalyticsCacheRepository:
+    def __init__(self):
+        self.by_user = {}
+
+    async def get(self, user_id: str):
+        return _copy(self.by_user.get(user_id))
+
+    async def save(self, user_id: str, stats: dict, through: str):
+        self.by_user[user_id] = {
+            "user_id": user_id, "stats": _copy(stats), "through": through, "updated_at": datetime.utcnow()
+        }
+
+    async def invalidate(self, user_id: str):
+        self.by_user.pop(user_id, None)
+
+    async def clear(self):
+        self.by_user.clear()
+
+    async def drop_habits(self, habit_ids: list, user_id: str = None):
+        caches = [self.by_user[user_id]] if user_id in self.by_user else [] if user_id else self.by_user.values()
+        for cache in caches:
+            for habit_id in habit_ids:
+                cache["stats"].pop(habit_id, None)
+
+    async def init(self):
+        pass
+
+
+class IngestKeyRepository:
+    def __init__(self):
+        self.keys = {}
+
+    async def claim(self, user_id: str, key: str, lease_seconds: float):
+        now = datetime.utcnow()
+        previous = self.keys.get((user_id, key))
+        expired = previous and previous["status"] == "pending" and previous["lease_until"] < now
+        if previous is None or previous["status"] == "failed" or expired:
+            self.keys[(user_id, key)] = {
+                "user_id": user_id, "key": key, "status": "pending",
+                "lease_until": now + timedelta(seconds=lease_seconds), "created_at": now
+            }
+            return True, None
+        return False, _copy(previous)
+
+    async def finish(self, user_id: str, key: str, result: dict):
+        self.keys[(user_id, key)].update(status="done", result=_copy(result))
+
+    async def fail(self, user_id: str, key: str):
+        self.keys[(user_id, key)]["status"] = "failed"
+
+    async def init(self):
+        pass
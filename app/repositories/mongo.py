@@ -0,0 +1,571 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.database import (
+    users_collection, blacklist_collection, habits_collection, habit_logs_collection, habit_buckets_collection,
+    reminders_collection, wellness_collection, wellness_sketches_collection, wellness_archive_collection,
+    ingest_keys_collection, analytics_cache_collection
+)
+from app.utils.habit_buckets import month_key, day_mask
+from app.utils.time_helpers import from_mongo, next_occurrence
+
+MIGRATION_BATCH_SIZE = 1000
+INGEST_KEYS_PER_DAY = 100  # idempotency keys remembered on each daily wellness log
+
+
+def _projection(fields):
+    return {field: 1 for field in fields} if fields else None
+
+
+def _object_ids(ids):
+    return [ObjectId(i) for i in ids if ObjectId.is_valid(str(i))]
+
+
+async def _distinct(collection, field: str, match: dict = None):
+    """Stream the distinct values of field without materialising them all"""
+    pipeline = [{"$match": match}] if match else []
+    pipeline.append({"$group": {"_id": f"${field}"}})
+    async for doc in collection.aggregate(pipeline, allowDiskUse=True):
+        if doc["_id"] is not None:
+            yield doc["_id"]
+
+
+class UserRepository:
+    async def get(self, user_id: str):
+        return await users_collection.find_one({"_id": ObjectId(user_id)})
+
+    async def get_by_email(self, email: str):
+        return await users_collection.find_one({"email": email})
+
+    async def create(self, user: dict) -> str:
+        result = await users_collection.insert_one(user)
+        return str(result.inserted_id)
+
+    async def update(self, user_id: str, fields: dict):
+        return await users_collection.find_one_and_update(
+            {"_id": ObjectId(user_id)}, {"$set": fields}, return_document=ReturnDocument.AFTER
+        )
+
+    async def delete(self, user_id: str):
+        await users_collection.delete_one({"_id": ObjectId(user_id)})
+
+    async def existing_ids(self, ids: list) -> set:
+        docs = await users_collection.find({"_id": {"$in": _object_ids(ids)}}, {"_id": 1}).to_list(None)
+        return {str(doc["_id"]) for doc in docs}
+
+    async def init(self):
+        await users_collection.create_index("email")
+
+
+class TokenRepository:
+    async def revoke(self, token: str):
+        await blacklist_collection.insert_one({"token": token})
+
+    async def is_revoked(self, token: str) -> bool:
+        return await blacklist_collection.find_one({"token": token}) is not None
+
+    async def revoke_user(self, user_id: str, reason: str):
+        await blacklist_collection.insert_one({"user_id": user_id, "reason": reason})
+
+    async def init(self):
+        await blacklist_collection.create_index("token")
+
+
+class HabitRepository:
+    async def create(self, habit: dict) -> str:
+        result = await habits_collection.insert_one(habit)
+        return str(result.inserted_id)
+
+    async def list_for_user(self, user_id: str, fields: list = None) -> list:
+        """The user's habits; fields limits the returned keys (plus _id)"""
+        return await habits_collection.find({"user_id": user_id}, _projection(fields)).to_list(None)
+
+    async def get(self, habit_id: str, user_id: str):
+        return await habits_collection.find_one({"_id": ObjectId(habit_id), "user_id": user_id})
+
+    async def update(self, habit_id: str, user_id: str, fields: dict):
+        return await habits_collection.find_one_and_update(
+            {"_id": ObjectId(habit_id), "user_id": user_id}, {"$set": fields}, return_document=ReturnDocument.AFTER
+        )
+
+    async def delete(self, habit_id: str, user_id: str) -> bool:
+        result = await habits_collection.delete_one({"_id": ObjectId(habit_id), "user_id": user_id})
+        return result.deleted_count > 0
+
+    async def count_for_user(self, user_id: str) -> int:
+        return await habits_collection.count_documents({"user_id": user_id})
+
+    async def pop_batch_for_user(self, user_id: str, limit: int) -> list:
+        """Delete up to limit of the user's habits and return their ids"""
+        docs = await habits_collection.find({"user_id": user_id}, {"_id": 1}).limit(limit).to_list(limit)
+        ids = [doc["_id"] for doc in docs]
+        if ids:
+            await habits_collection.delete_many({"_id": {"$in": ids}})
+        return [str(i) for i in ids]
+
+    async def existing_ids(self, ids: list) -> set:
+        docs = await habits_collection.find({"_id": {"$in": _object_ids(ids)}}, {"_id": 1}).to_list(None)
+        return {str(doc["_id"]) for doc in docs}
+
+    def distinct_user_ids(self):
+        return _distinct(habits_collection, "user_id")
+
+    async def init(self):
+        await habits_collection.create_index("user_id")
+
+
+class HabitLogRepository:
+    """Habit completions as one (habit_id, month) bucket with a 31-bit completion bitmap"""
+
+    async def log_completion(self, habit_id: str, user_id: str, day: date) -> bool:
+        # Set the day's bit only if it is still clear. If the bucket exists with the bit already set the
+        # filter misses, the upsert collides with the unique (habit_id, month) index, and we know it's a repeat.
+        try:
+            await habit_buckets_collection.update_one(
+                {
+                    "habit_id": habit_id,
+                    "user_id": user_id,
+                    "month": month_key(day),
+                    "bits": {"$bitsAllClear": day_mask(day)}
+                },
+                {"$bit": {"bits": {"or": day_mask(day)}}, "$inc": {"count": 1}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def buckets_for_user(self, user_id: str, start_month: str = None, end_month: str = None) -> list:
+        query = {"user_id": user_id}
+        if start_month or end_month:
+            query["month"] = {}
+            if start_month:
+                query["month"]["$gte"] = start_month
+            if end_month:
+                query["month"]["$lte"] = end_month
+        return await habit_buckets_collection.find(
+            query, {"_id": 0, "habit_id": 1, "month": 1, "bits": 1}
+        ).to_list(None)
+
+    async def count_completed_on(self, user_id: str, day: date) -> int:
+        return await habit_buckets_collection.count_documents({
+            "user_id": user_id,
+            "month": month_key(day),
+            "bits": {"$bitsAllSet": day_mask(day)}
+        })
+
+    async def delete_for_habits(self, habit_ids: list):
+        await habit_buckets_collection.delete_many({"habit_id": {"$in": habit_ids}})
+
+    async def delete_for_user(self, user_id: str):
+        await habit_buckets_collection.delete_many({"user_id": user_id})
+
+    def distinct_user_ids(self):
+        return _distinct(habit_buckets_collection, "user_id")
+
+    def distinct_habit_ids(self):
+        return _distinct(habit_buckets_collection, "habit_id")
+
+    async def migrate_legacy(self) -> int:
+        """Fold legacy one-document-per-day habit_logs into month buckets, then drop the originals.
+
+        Runs in the background after startup (see app.utils.habit_migration); returns how many logs moved.
+        """
+        migrated = 0
+        while True:
+            batch = await habit_logs_collection.find(
+                {}, {"habit_id": 1, "user_id": 1, "date": 1}
+            ).limit(MIGRATION_BATCH_SIZE).to_list(MIGRATION_BATCH_SIZE)
+            if not batch:
+                return migrated
+
+            masks = defaultdict(int)
+            for log in batch:
+                day = date.fromisoformat(log["date"])
+                masks[(log["habit_id"], log["user_id"], month_key(day))] |= day_mask(day)
+
+            # $bit is idempotent, so a batch interrupted before the delete can safely be replayed
+            await habit_buckets_collection.bulk_write([
+                UpdateOne(
+                    {"habit_id": habit_id, "user_id": user_id, "month": month},
+                    {"$bit": {"bits": {"or": mask}}},
+                    upsert=True
+                )
+                for (habit_id, user_id, month), mask in masks.items()
+            ])
+
+            # Counts are derived from the merged bitmaps so they stay exact across batches; the bits
+            # filter leaves a bucket alone if log_completion changed it in the meantime
+            buckets = await habit_buckets_collection.find(
+                {"$or": [{"habit_id": habit_id, "month": month} for habit_id, _, month in masks]}, {"bits": 1}
+            ).to_list(None)
+            await habit_buckets_collection.bulk_write([
+                UpdateOne(
+                    {"_id": bucket["_id"], "bits": bucket["bits"]}, {"$set": {"count": bin(bucket["bits"]).count("1")}}
+                )
+                for bucket in buckets
+            ], ordered=False)
+
+            await habit_logs_collection.delete_many({"_id": {"$in": [log["_id"] for log in batch]}})
+            migrated += len(batch)
+
+    async def init(self):
+        await habit_buckets_collection.create_index([("habit_id", 1), ("month", 1)], unique=True)
+        await habit_buckets_collection.create_index([("user_id", 1), ("month", 1)])
+
+
+class WellnessLogRepository:
+    async def get_by_date(self, user_id: str, day: str):
+        return await wellness_collection.find_one({"user_id": user_id, "date": day})
+
+    async def create(self, log: dict):
+        """Returns the new id, or None if the user already has a log for that date"""
+        try:
+            result = await wellness_collection.insert_one(log)
+        except DuplicateKeyError:
+            return None
+        return str(result.inserted_id)
+
+    async def list_for_user(self, user_id: str, start: str = None, end: str = None, fields: list = None) -> list:
+        """Logs ordered by date, optionally limited to [start, end] (ISO dates) and to fields (plus _id)"""
+        query = {"user_id": user_id}
+        if start or end:
+            query["date"] = {}
+            if start:
+                query["date"]["$gte"] = start
+            if end:
+                query["date"]["$lte"] = end
+        return await wellness_collection.find(query, _projection(fields)).sort("date", 1).to_list(None)
+
+    async def update(self, log_id: str, user_id: str, fields: dict):
+        """Apply fields and return the document as it was before the update"""
+        return await wellness_collection.find_one_and_update(
+            {"_id": ObjectId(log_id), "user_id": user_id},
+            {"$set": fields},
+            return_document=ReturnDocument.BEFORE
+        )
+
+    async def delete(self, log_id: str, user_id: str):
+        return await wellness_collection.find_one_and_delete({"_id": ObjectId(log_id), "user_id": user_id})
+
+    async def merge_daily(self, user_id: str, day: str, inc: dict, maximums: dict, on_insert: dict, ingest_key: str = None):
+        """Atomically $inc/$max a day's document (creating it if needed).
+
+        With an ingest_key the key is recorded on the document in the same update, and a day that
+        already carries it is left alone. Returns (applied, document as it was before).
+        """
+        query = {"user_id": user_id, "date": day}
+        update = {"$setOnInsert": on_insert}
+        if inc:
+            update["$inc"] = inc
+        if maximums:
+            update["$max"] = maximums
+        if ingest_key:
+            query["ingest_keys"] = {"$ne": ingest_key}
+            update["$push"] = {"ingest_keys": {"$each": [ingest_key], "$slice": -INGEST_KEYS_PER_DAY}}
+
+        for _ in range(2):
+            try:
+                before = await wellness_collection.find_one_and_update(
+                    query, update, upsert=True, return_document=ReturnDocument.BEFORE
+                )
+                return True, before
+            except DuplicateKeyError:
+                # The day exists: either it already has this key, or another writer created it
+                # between our read and insert, in which case the retry becomes a plain update.
+                if ingest_key and await wellness_collection.find_one(
+                    {"user_id": user_id, "date": day, "ingest_keys": ingest_key}, {"_id": 1}
+                ):
+                    return False, None
+        raise DuplicateKeyError(f"Could not merge wellness log for {day}")
+
+    async def pop_batch(self, user_id: str, limit: int) -> list:
+        """Delete up to limit of the user's logs and return them"""
+        batch = await wellness_collection.find({"user_id": user_id}).limit(limit).to_list(limit)
+        if batch:
+            await wellness_collection.delete_many({"_id": {"$in": [log["_id"] for log in batch]}})
+        return batch
+
+    async def iter_all(self):
+        async for log in wellness_collection.find({}, {"_id": 0, "date": 1, "sleep_hours": 1, "steps": 1, "water_intake_liters": 1}):
+            yield log
+
+    async def iter_before(self, day: str):
+        """Logs dated before day, in (user_id, date) order"""
+        cursor = wellness_collection.find({"date": {"$lt": day}}).sort([("user_id", 1), ("date", 1)])
+        async for log in cursor:
+            yield log
+
+    async def delete_range(self, user_id: str, start: str, end: str):
+        """Delete a user's logs dated in [start, end)"""
+        await wellness_collection.delete_many({"user_id": user_id, "date": {"$gte": start, "$lt": end}})
+
+    def distinct_user_ids(self):
+        return _distinct(wellness_collection, "user_id")
+
+    async def dedupe_days(self) -> int:
+        """Fold duplicate (user_id, date) logs into the oldest, filling only the fields it lacks"""
+        removed = 0
+        pipeline = [
+            {"$group": {"_id": {"user_id": "$user_id", "date": "$date"}, "ids": {"$push": "$_id"}}},
+            {"$match": {"ids.1": {"$exists": True}}}
+        ]
+        async for group in wellness_collection.aggregate(pipeline, allowDiskUse=True):
+            keep, *extras = await wellness_collection.find({"_id": {"$in": group["ids"]}}).sort("_id", 1).to_list(None)
+            missing = {}
+            for extra in extras:
+                for field, value in extra.items():
+                    if field != "_id" and keep.get(field) is None and value is not None:
+                        missing.setdefault(field, value)
+            if missing:
+                await wellness_collection.update_one({"_id": keep["_id"]}, {"$set": missing})
+            await wellness_collection.delete_many({"_id": {"$in": [extra["_id"] for extra in extras]}})
+            removed += len(extras)
+        return removed
+
+    async def init(self):
+        # (user_id, date) used to be a plain index, so concurrent merge_daily upserts could race into
+        # duplicate days. Fold those together before the unique index can be built.
+        indexes = await wellness_collection.index_information()
+        if not indexes.get("user_id_1_date_1", {}).get("unique"):
+            if await self.dedupe_days():
+                # The sketches counted the duplicates; let ensure_wellness_sketches rebuild them
+                await wellness_sketches_collection.delete_many({})
+            if "user_id_1_date_1" in indexes:
+                await wellness_collection.drop_index("user_id_1_date_1")
+        await wellness_collection.create_index([("user_id", 1), ("date", 1)], unique=True)
+        await wellness_collection.create_index("date")
+
+
+class WellnessArchiveRepository:
+    """Weekly and monthly roll-ups of wellness logs past the archive age"""
+
+    async def save(self, user_id: str, summaries: list):
+        """summaries: (period, start, fields) tuples, written with $set so replays are harmless"""
+        await wellness_archive_collection.bulk_write([
+            UpdateOne({"user_id": user_id, "period": period, "start": start}, {"$set": fields}, upsert=True)
+            for period, start, fields in summaries
+        ])
+
+    async def list_for_user(self, user_id: str, period: str, start: str = None, end: str = None) -> list:
+        query = {"user_id": user_id, "period": period}
+        if start or end:
+            query["start"] = {}
+            if start:
+                query["start"]["$gte"] = start
+            if end:
+                query["start"]["$lte"] = end
+        return await wellness_archive_collection.find(query).sort("start", 1).to_list(None)
+
+    async def week_containing(self, user_id: str, day: str):
+        return await wellness_archive_collection.find_one({
+            "user_id": user_id, "period": "week", "start": {"$lte": day}, "end": {"$gte": day}
+        })
+
+    async def delete_for_user(self, user_id: str):
+        await wellness_archive_collection.delete_many({"user_id": user_id})
+
+    def distinct_user_ids(self):
+        return _distinct(wellness_archive_collection, "user_id")
+
+    async def init(self):
+        await wellness_archive_collection.create_index([("user_id", 1), ("period", 1), ("start", 1)], unique=True)
+
+
+class SketchRepository:
+    """One document per day holding population histograms for the wellness metrics"""
+
+    async def increment(self, increments: dict, upsert: bool = True):
+        """increments: {date: {field: delta}}, applied atomically per day"""
+        if increments:
+            await wellness_sketches_collection.bulk_write([
+                UpdateOne({"date": day}, {"$inc": dict(inc)}, upsert=upsert) for day, inc in increments.items()
+            ])
+
+    async def list_between(self, start: str, end: str) -> list:
+        return await wellness_sketches_collection.find({"date": {"$gte": start, "$lte": end}}).to_list(None)
+
+    async def clear(self):
+        await wellness_sketches_collection.delete_many({})
+
+    async def is_empty(self) -> bool:
+        return await wellness_sketches_collection.estimated_document_count() == 0
+
+    async def init(self):
+        await wellness_sketches_collection.create_index("date", unique=True)
+
+
+class ReminderRepository:
+    async def create(self, reminder: dict) -> str:
+        result = await reminders_collection.insert_one(reminder)
+        return str(result.inserted_id)
+
+    async def list_for_user(self, user_id: str) -> list:
+        return await reminders_collection.find({"user_id": user_id}).sort("next_fire_at", 1).to_list(None)
+
+    async def get(self, reminder_id: str, user_id: str):
+        return await reminders_collection.find_one({"_id": ObjectId(reminder_id), "user_id": user_id})
+
+    async def update(self, reminder_id: str, user_id: str, fields: dict):
+        return await reminders_collection.find_one_and_update(
+            {"_id": ObjectId(reminder_id), "user_id": user_id}, {"$set": fields}, return_document=ReturnDocument.AFTER
+        )
+
+    async def delete(self, reminder_id: str, user_id: str) -> bool:
+        result = await reminders_collection.delete_one({"_id": ObjectId(reminder_id), "user_id": user_id})
+        return result.deleted_count > 0
+
+    async def one_off_between(self, user_id: str, start: datetime, end: datetime, limit: int) -> list:
+        """One-off reminders firing in [start, end]: a bounded range scan on (user_id, next_fire_at)"""
+        return await reminders_collection.find({
+            "user_id": user_id,
+            "repeat": {"$nin": ["daily", "weekly"]},
+            "next_fire_at": {"$gte": start, "$lte": end}
+        }).sort("next_fire_at", 1).limit(limit).to_list(limit)
+
+    async def repeating_for_user(self, user_id: str, end: datetime) -> list:
+        """All of the user's repeating reminders anchored (reminder_time) by end.
+
+        next_fire_at only ever moves forward, so it can't bound a window that starts in the past;
+        a repeating reminder can recur inside any window, so these are scanned in full and the
+        (user_id, next_fire_at) index only bounds the one-off lookup above.
+        """
+        return await reminders_collection.find({
+            "user_id": user_id,
+            "repeat": {"$in": ["daily", "weekly"]},
+            "reminder_time": {"$lte": end}
+        }).to_list(None)
+
+    async def advance_many(self, updates: list):
+        """Move next_fire_at forward for (reminder_id, current, next_fire_at) tuples in one round trip,
+        skipping any reminder that was changed since it was read"""
+        await reminders_collection.bulk_write([
+            UpdateOne({"_id": ObjectId(reminder_id), "next_fire_at": current}, {"$set": {"next_fire_at": next_fire_at}})
+            for reminder_id, current, next_fire_at in updates
+        ], ordered=False)
+
+    async def pop_batch(self, limit: int, user_id: str = None, habit_ids: list = None) -> list:
+        """Delete up to limit reminders for a user or for habit targets and return their ids"""
+        query = {"user_id": user_id} if user_id else {"reminder_type": "habit", "target_id": {"$in": habit_ids}}
+        docs = await reminders_collection.find(query, {"_id": 1}).limit(limit).to_list(limit)
+        ids = [doc["_id"] for doc in docs]
+        if ids:
+            await reminders_collection.delete_many({"_id": {"$in": ids}})
+        return [str(i) for i in ids]
+
+    def distinct_user_ids(self):
+        return _distinct(reminders_collection, "user_id")
+
+    def distinct_habit_targets(self):
+        """Only targets checked against the habits collection, so a stray id can't purge live data"""
+        return _distinct(reminders_collection, "target_id", {"reminder_type": "habit", "target_verified": True})
+
+    async def migrate_legacy(self):
+        """Convert legacy ISO-string reminder times to UTC datetimes with next_fire_at"""
+        now = datetime.now(timezone.utc)
+        cursor = reminders_collection.find(
+            {"$or": [{"reminder_time": {"$type": "string"}}, {"next_fire_at": {"$exists": False}}]},
+            {"reminder_time": 1, "repeat": 1}
+        )
+        async for doc in cursor:
+            reminder_time = from_mongo(doc["reminder_time"])
+            await reminders_collection.update_one(
+                {"_id": doc["_id"]},
+                {"$set": {
+                    "reminder_time": reminder_time,
+                    "next_fire_at": next_occurrence(reminder_time, doc.get("repeat"), now)
+                }}
+            )
+
+    async def verify_legacy_targets(self):
+        """Mark habit reminders created before targets were validated: verified only if the habit exists"""
+        cursor = reminders_collection.find(
+            {"reminder_type": "habit", "target_verified": {"$exists": False}}, {"user_id": 1, "target_id": 1}
+        )
+        async for doc in cursor:
+            target = doc.get("target_id")
+            verified = bool(target) and ObjectId.is_valid(target) and await habits_collection.find_one(
+                {"_id": ObjectId(target), "user_id": doc["user_id"]}, {"_id": 1}
+            ) is not None
+            await reminders_collection.update_one({"_id": doc["_id"]}, {"$set": {"target_verified": verified}})
+
+    async def init(self):
+        await reminders_collection.create_index([("user_id", 1), ("next_fire_at", 1)])
+        await reminders_collection.create_index("target_id")
+        await self.migrate_legacy()
+        await self.verify_legacy_targets()
+
+
+class AnalyticsCacheRepository:
+    async def get(self, user_id: str):
+        return await analytics_cache_collection.find_one({"user_id": user_id})
+
+    async def save(self, user_id: str, stats: dict, through: str):
+        await analytics_cache_collection.update_one(
+            {"user_id": user_id},
+            {"$set": {"stats": stats, "through": through, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def invalidate(self, user_id: str):
+        await analytics_cache_collection.delete_one({"user_id": user_id})
+
+    async def clear(self):
+        await analytics_cache_collection.delete_many({})
+
+    async def drop_habits(self, habit_ids: list, user_id: str = None):
+        """Without a user_id, only the caches that actually hold one of these habits are rewritten"""
+        query = {"user_id": user_id} if user_id else {
+            "$or": [{f"stats.{habit_id}": {"$exists": True}} for habit_id in habit_ids]
+        }
+        await analytics_cache_collection.update_many(
+            query, {"$unset": {f"stats.{habit_id}": "" for habit_id in habit_ids}}
+        )
+
+    async def init(self):
+        await analytics_cache_collection.create_index("user_id", unique=True)
+
+
+class IngestKeyRepository:
+    """Idempotency keys for wearable uploads: pending -> done, or failed (resumable)"""
+
+    async def claim(self, user_id: str, key: str, lease_seconds: float):
+        """Returns (True, None) when the caller may run the upload: a new key, a failed one, or a pending
+        one whose lease ran out because its process died. Otherwise (False, the key's document)."""
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=lease_seconds)
+        try:
+            await ingest_keys_collection.insert_one({
+                "user_id": user_id, "key": key, "status": "pending", "lease_until": lease_until, "created_at": now
+            })
+            return True, None
+        except DuplicateKeyError:
+            reclaimed = await ingest_keys_collection.find_one_and_update(
+                {
+                    "user_id": user_id,
+                    "key": key,
+                    "$or": [
+                        {"status": "failed"},
+                        {"status": "pending", "lease_until": {"$lt": now}},
+                        {"status": "pending", "lease_until": {"$exists": False}}
+                    ]
+                },
+                {"$set": {"status": "pending", "lease_until": lease_until}}
+            )
+            if reclaimed:
+                return True, None
+            return False, await ingest_keys_collection.find_one({"user_id": user_id, "key": key})
+
+    async def finish(self, user_id: str, key: str, result: dict):
+        await ingest_keys_collection.update_one(
+            {"user_id": user_id, "key": key}, {"$set": {"status": "done", "result": result}}
+        )
+
+    async def fail(self, user_id: str, key: str):
+        await ingest_keys_collection.update_one({"user_id": user_id, "key": key}, {"$set": {"status": "failed"}})
+
+    async def init(self):
+        await ingest_keys_collection.create_index([("user_id", 1), ("key", 1)], unique=True)
+        await ingest_keys_collection.create_index("created_at", expireAfterSeconds=7 * 24 * 3600)
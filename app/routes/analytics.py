@@ -1,32 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from app.utils.security import get_current_user
-from app.database import db
-from datetime import datetime, timedelta
+from app.storage import storage
+from datetime import datetime, timedelta, date
+from typing import Optional
 from app.utils.mongo_helpers import serialize_doc
+from app.utils.correlation import METRICS, build_stats, merge_stats, summarize
+from app.utils.sketches import SKETCH_BINS, WINDOWS, load_daily_sketches, percentile
+from app.utils.wellness_archive import archived_summaries
+from app.utils.habit_buckets import month_key, bucket_days, count_between, streaks
+from collections import defaultdict
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
-habits_collection = db["habits"]
-habit_logs_collection = db["habit_logs"]
-wellness_collection = db["wellness_logs"]
-
 # 1. Habit Consistency Report
 @router.get("/habits")
 async def habit_consistency(current_user: dict = Depends(get_current_user)):
     user_id = str(current_user["_id"])
-    habits = await habits_collection.find({"user_id": user_id}).to_list(None)
+    habits = await storage.habits.list_for_user(user_id, ["name", "frequency"])
+
+    today = datetime.utcnow().date()
+    start_date = today - timedelta(days=30)
+
+    # One query for every habit's month buckets overlapping the window
+    counts = defaultdict(int)
+    for bucket in await storage.habit_logs.buckets_for_user(user_id, month_key(start_date), month_key(today)):
+        counts[bucket["habit_id"]] += count_between(bucket, start_date, today)
 
     report = []
     for habit in habits:
         total_days = 30  # last 30 days
-        start_date = datetime.utcnow().date() - timedelta(days=30)
-        logs = await habit_logs_collection.find({
-            "habit_id": str(habit["_id"]),
-            "user_id": user_id,
-            "date": {"$gte": start_date.isoformat()}
-        }).to_list(None)
-
-        completed_days = len(logs)
+        completed_days = counts[str(habit["_id"])]
         consistency = (completed_days / total_days) * 100 if total_days else 0
 
         report.append({
@@ -39,33 +42,42 @@ async def habit_consistency(current_user: dict = Depends(get_current_user)):
     return {"habit_consistency": report}
 
 
-# 2. Wellness Trends (last 30 days)
+# 2. Wellness Trends (last 30 days by default)
 @router.get("/wellness")
-async def wellness_trends(current_user: dict = Depends(get_current_user)):
+async def wellness_trends(
+    days: int = Query(30, ge=1, le=3650),
+    current_user: dict = Depends(get_current_user)
+):
     user_id = str(current_user["_id"])
-    start_date = datetime.utcnow().date() - timedelta(days=30)
+    start_date = datetime.utcnow().date() - timedelta(days=days)
 
-    cursor = wellness_collection.find({
-        "user_id": user_id,
-        "date": {"$gte": start_date.isoformat()}
-    })
+    # Older history is read from weekly roll-ups, so long ranges cost one document per week
+    # Each metric is averaged over the days that tracked it, so wearable-only days don't drag others to 0
+    totals = {"sleep_hours": 0, "steps": 0, "water_intake_liters": 0}
+    logged_days = dict.fromkeys(totals, 0)
+    for week in await archived_summaries(user_id, "week", start=start_date):
+        for metric in totals:
+            totals[metric] += week[metric]
+            logged_days[metric] += week.get(f"{metric}_days", week["days"])
 
-    sleep = []
-    steps = []
-    water = []
     moods = []
 
-    async for log in cursor:
-        sleep.append(log["sleep_hours"])
-        steps.append(log["steps"])
-        water.append(log["water_intake_liters"])
+    logs = await storage.wellness.list_for_user(user_id, start=start_date.isoformat(), fields=[*totals, "mood"])
+    for log in logs:
+        for metric in totals:
+            if log.get(metric) is not None:
+                totals[metric] += log[metric]
+                logged_days[metric] += 1
         if log.get("mood"):
             moods.append(log["mood"])
 
+    def average(metric):
+        return round(totals[metric] / logged_days[metric], 2) if logged_days[metric] else 0
+
     return {
-        "average_sleep": round(sum(sleep)/len(sleep), 2) if sleep else 0,
-        "average_steps": round(sum(steps)/len(steps), 2) if steps else 0,
-        "average_water_intake": round(sum(water)/len(water), 2) if water else 0,
+        "average_sleep": average("sleep_hours"),
+        "average_steps": average("steps"),
+        "average_water_intake": average("water_intake_liters"),
         "mood_trend": moods[-7:] if moods else []  # last 7 mood entries
     }
 
@@ -77,13 +89,15 @@ async def progress_summary(current_user: dict = Depends(get_current_user)):
     today = datetime.utcnow().date()
 
     # Count total habits
-    total_habits = await habits_collection.count_documents({"user_id": user_id})
+    total_habits = await storage.habits.count_for_user(user_id)
 
     # Today’s habit logs
-    today_habits = await habit_logs_collection.count_documents({"user_id": user_id, "date": today.isoformat()})
+    today_habits = await storage.habit_logs.count_completed_on(user_id, today)
 
     # Today’s wellness log
-    wellness_today = await wellness_collection.find_one({"user_id": user_id, "date": today.isoformat()})
+    wellness_today = await storage.wellness.get_by_date(user_id, today.isoformat())
+    if wellness_today:
+        wellness_today.pop("ingest_keys", None)  # idempotency bookkeeping from wearable uploads
 
     summary = {
         "total_habits": total_habits,
@@ -92,3 +106,121 @@ async def progress_summary(current_user: dict = Depends(get_current_user)):
     }
 
     return summary
+
+
+# 4. Habit vs Wellness Correlations
+@router.get("/correlations")
+async def habit_wellness_correlations(current_user: dict = Depends(get_current_user)):
+    user_id = str(current_user["_id"])
+    today = datetime.utcnow().date()
+    yesterday = (today - timedelta(days=1)).isoformat()
+
+    habits = await storage.habits.list_for_user(user_id, ["name", "created_at"])
+
+    # Only complete days (before today) are cached; each call folds in just the days since the last one
+    cache = await storage.analytics_cache.get(user_id) or {}
+    stats = cache.get("stats", {})
+    through = cache.get("through")
+
+    if through is None or through < yesterday:
+        start = date.fromisoformat(through) + timedelta(days=1) if through else None
+        habit_logs = []
+        buckets = await storage.habit_logs.buckets_for_user(
+            user_id, month_key(start) if start else None, month_key(today)
+        )
+        for bucket in buckets:
+            habit_logs.extend(
+                {"habit_id": bucket["habit_id"], "date": day.isoformat()}
+                for day in bucket_days(bucket)
+                if day < today and (start is None or day >= start)
+            )
+        wellness_logs = await storage.wellness.list_for_user(
+            user_id, start.isoformat() if start else None, yesterday, ["date", *METRICS]
+        )
+
+        stats = merge_stats(stats, build_stats(habits, habit_logs, wellness_logs))
+        await storage.analytics_cache.save(user_id, stats, yesterday)
+
+    correlations = []
+    for habit in habits:
+        habit_stats = stats.get(str(habit["_id"]), {})
+        for metric, threshold in METRICS.items():
+            if metric not in habit_stats:
+                continue
+            correlations.append({
+                "habit_id": str(habit["_id"]),
+                "habit_name": habit["name"],
+                "metric": metric,
+                "threshold": threshold,
+                **summarize(habit_stats[metric])
+            })
+
+    return {"correlations": correlations}
+
+
+# 5. Population Percentiles (sleep, steps, water)
+@router.get("/percentiles")
+async def wellness_percentiles(
+    window: str = Query("day", pattern="^(day|7d|30d)$"),
+    log_date: Optional[date] = Query(None, alias="date"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Rank each of the user's days against everyone's values for that same day.
+
+    For 7d/30d the percentile is the mean of those daily ranks, so every day weighs the same
+    regardless of how many people logged it.
+    """
+    user_id = str(current_user["_id"])
+    end = log_date or datetime.utcnow().date()
+    days = WINDOWS[window]
+    start = end - timedelta(days=days - 1)
+
+    logs = await storage.wellness.list_for_user(user_id, start.isoformat(), end.isoformat(), ["date", *SKETCH_BINS])
+    if not logs:
+        raise HTTPException(status_code=404, detail="No wellness logs in this window")
+
+    sketches = await load_daily_sketches(start, end)
+
+    metrics = {}
+    for metric in SKETCH_BINS:
+        values, ranks = [], []
+        for log in logs:
+            if log.get(metric) is None or log["date"] not in sketches:
+                continue
+            values.append(log[metric])
+            ranks.append(percentile(sketches[log["date"]][metric], metric, log[metric]))
+        ranks = [rank for rank in ranks if rank is not None]
+        if not ranks:
+            continue
+        rank = round(sum(ranks) / len(ranks), 1)
+        metrics[metric] = {
+            "value": round(sum(values) / len(values), 2),
+            "percentile": rank,
+            "top_percent": round(100 - rank, 1),
+            "days": len(ranks)
+        }
+
+    return {
+        "window": window,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "metrics": metrics
+    }
+
+
+# 6. Habit Streaks
+@router.get("/streaks")
+async def habit_streaks(current_user: dict = Depends(get_current_user)):
+    user_id = str(current_user["_id"])
+    habits = await storage.habits.list_for_user(user_id, ["name"])
+
+    # Buckets are one small document per habit per month, so full history is cheap to read
+    buckets = defaultdict(list)
+    for bucket in await storage.habit_logs.buckets_for_user(user_id):
+        buckets[bucket["habit_id"]].append(bucket)
+
+    today = datetime.utcnow().date()
+    return {"habit_streaks": [
+        {"habit_name": habit["name"], **streaks(buckets[str(habit["_id"])], today)}
+        for habit in habits
+    ]}
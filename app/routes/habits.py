@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from app.models.habit import HabitCreate, HabitUpdate,HabitResponse, HabitListResponse, HabitLogResponse
 from app.utils.security import get_current_user
-from app.database import habits_collection, habit_logs_collection
-from bson import ObjectId
+from app.storage import storage
+from app.utils.cleanup import purge_habits
 from datetime import datetime
 
 router = APIRouter(prefix="/habits", tags=["Habits"])
@@ -16,9 +16,9 @@ async def create_habit(habit: HabitCreate, current_user: dict = Depends(get_curr
         "frequency": habit.frequency,
         "created_at": datetime.utcnow()
     }
-    result = await habits_collection.insert_one(new_habit)
+    habit_id = await storage.habits.create(new_habit)
     return HabitResponse(
-        id=str(result.inserted_id),
+        id=habit_id,
         user_id=new_habit["user_id"],
         name=new_habit["name"],
         frequency=new_habit["frequency"],
@@ -28,9 +28,8 @@ async def create_habit(habit: HabitCreate, current_user: dict = Depends(get_curr
 # Get all habits for logged-in user
 @router.get("/", response_model=HabitListResponse)
 async def get_habits(current_user: dict = Depends(get_current_user)):
-    cursor = habits_collection.find({"user_id": str(current_user["_id"])})
     habits = []
-    async for doc in cursor:
+    for doc in await storage.habits.list_for_user(str(current_user["_id"])):
         habits.append(HabitResponse(
             id=str(doc["_id"]),
             user_id=doc["user_id"],
@@ -43,7 +42,7 @@ async def get_habits(current_user: dict = Depends(get_current_user)):
 # Get habit by ID
 @router.get("/{habit_id}", response_model=HabitResponse)
 async def get_habit(habit_id: str, current_user: dict = Depends(get_current_user)):
-    habit = await habits_collection.find_one({"_id": ObjectId(habit_id), "user_id": str(current_user["_id"])})
+    habit = await storage.habits.get(habit_id, str(current_user["_id"]))
     if not habit:
         raise HTTPException(status_code=404, detail="Habit not found")
     
@@ -62,11 +61,7 @@ async def update_habit(habit_id: str, update_data: HabitUpdate, current_user: di
     if not update_dict:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    habit = await habits_collection.find_one_and_update(
-        {"_id": ObjectId(habit_id), "user_id": str(current_user["_id"])},
-        {"$set": update_dict},
-        return_document=True
-    )
+    habit = await storage.habits.update(habit_id, str(current_user["_id"]), update_dict)
 
     if not habit:
         raise HTTPException(status_code=404, detail="Habit not found")
@@ -81,37 +76,26 @@ async def update_habit(habit_id: str, update_data: HabitUpdate, current_user: di
 
 # Delete a habit
 @router.delete("/{habit_id}")
-async def delete_habit(habit_id: str, current_user: dict = Depends(get_current_user)):
-    result = await habits_collection.delete_one({"_id": ObjectId(habit_id), "user_id": str(current_user["_id"])})
-    if result.deleted_count == 0:
+async def delete_habit(habit_id: str, background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
+    if not await storage.habits.delete(habit_id, str(current_user["_id"])):
         raise HTTPException(status_code=404, detail="Habit not found")
+
+    # Logs, reminders and their scheduler jobs are removed after the response is sent
+    background_tasks.add_task(purge_habits, [habit_id], str(current_user["_id"]))
     return {"msg": "Habit deleted successfully"}
 
 # Log habit completion for today
 @router.post("/{habit_id}/log", response_model=HabitLogResponse)
 async def log_habit_completion(habit_id: str, current_user: dict = Depends(get_current_user)):
-    habit = await habits_collection.find_one({"_id": ObjectId(habit_id), "user_id": str(current_user["_id"])})
+    habit = await storage.habits.get(habit_id, str(current_user["_id"]))
     if not habit:
         raise HTTPException(status_code=404, detail="Habit not found")
 
     today = datetime.utcnow().date()
-    existing_log = await habit_logs_collection.find_one({
-        "habit_id": habit_id,
-        "user_id": str(current_user["_id"]),
-        "date": today.isoformat()
-    })
 
-    if existing_log:
+    if not await storage.habit_logs.log_completion(habit_id, str(current_user["_id"]), today):
         raise HTTPException(status_code=400, detail="Habit already logged for today")
 
-    log_entry = {
-        "habit_id": habit_id,
-        "user_id": str(current_user["_id"]),
-        "date": today.isoformat(),
-        "status": "completed"       
-    }
-    await habit_logs_collection.insert_one(log_entry)
-
     return HabitLogResponse(
         habit_id=habit_id,
         user_id=str(current_user["_id"]),
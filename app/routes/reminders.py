@@ -1,38 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.models.reminder import ReminderCreate, ReminderUpdate, ReminderResponse
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.models.reminder import ReminderCreate, ReminderUpdate, ReminderResponse, UpcomingReminderResponse
 from app.utils.security import get_current_user
 from app.utils.scheduler import schedule_reminder
-from app.database import db
+from app.utils.time_helpers import IST, REPEAT_INTERVALS, to_utc, from_mongo, next_occurrence, iter_occurrences
+from app.storage import storage
 from bson import ObjectId
-from datetime import datetime
-import pytz
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import heapq
+import itertools
 
 router = APIRouter(prefix="/reminders", tags=["Reminders"])
 
-reminders_collection = db["reminders"]
-IST = pytz.timezone("Asia/Kolkata")
+async def _advance_repeating(docs: list, now: datetime) -> list:
+    """Move next_fire_at of repeating reminders that have already fired on to their next occurrence.
+
+    The docs are updated in place for the caller; the stale ones are saved in a single batch.
+    """
+    stale = []
+    for doc in docs:
+        if doc.get("repeat") not in REPEAT_INTERVALS:
+            continue
+        current = from_mongo(doc["next_fire_at"])
+        upcoming = next_occurrence(current, doc["repeat"], now)
+        if upcoming != current:
+            stale.append((str(doc["_id"]), doc["next_fire_at"], upcoming))
+            doc["next_fire_at"] = upcoming
+    if stale:
+        await storage.reminders.advance_many(stale)
+    return docs
 
 @router.post("/", response_model=ReminderResponse)
 async def create_reminder(reminder: ReminderCreate, current_user: dict = Depends(get_current_user)):
+    # Habit targets must be one of the user's habits; the orphan sweep relies on target_verified
+    if reminder.reminder_type == "habit" and reminder.target_id:
+        if not ObjectId.is_valid(reminder.target_id):
+            raise HTTPException(status_code=400, detail="target_id must be a habit id")
+        if not await storage.habits.get(reminder.target_id, str(current_user["_id"])):
+            raise HTTPException(status_code=404, detail="Habit not found")
+
+    reminder_time = to_utc(reminder.reminder_time)
     new_reminder = {
         "user_id": str(current_user["_id"]),
         "title": reminder.title,
         "reminder_type": reminder.reminder_type,
         "target_id": reminder.target_id,
-        "reminder_time": reminder.reminder_time.isoformat(),
+        "target_verified": reminder.reminder_type == "habit" and bool(reminder.target_id),
+        "reminder_time": reminder_time,
+        "next_fire_at": next_occurrence(reminder_time, reminder.repeat, datetime.now(timezone.utc)),
         "repeat": reminder.repeat,
         "created_at": datetime.now(IST)
     }
 
-    result = await reminders_collection.insert_one(new_reminder)
-    reminder_id = str(result.inserted_id)
+    reminder_id = await storage.reminders.create(new_reminder)
 
     # Schedule the reminder
     schedule_reminder(
         reminder_id=reminder_id,
         title=reminder.title,
         user_id=str(current_user["_id"]),
-        reminder_time=reminder.reminder_time
+        reminder_time=reminder_time
     )
 
     return ReminderResponse(
@@ -41,7 +68,7 @@ async def create_reminder(reminder: ReminderCreate, current_user: dict = Depends
         title=new_reminder["title"],
         reminder_type=new_reminder["reminder_type"],
         target_id=new_reminder["target_id"],
-        reminder_time=reminder.reminder_time,
+        reminder_time=reminder_time,
         repeat=new_reminder["repeat"],
         created_at=new_reminder["created_at"]
     )
@@ -49,21 +76,68 @@ async def create_reminder(reminder: ReminderCreate, current_user: dict = Depends
 # Get all reminders for logged-in user
 @router.get("/", response_model=list[ReminderResponse])
 async def get_reminders(current_user: dict = Depends(get_current_user)):
-    cursor = reminders_collection.find({"user_id": str(current_user["_id"])})
+    docs = await storage.reminders.list_for_user(str(current_user["_id"]))
+    docs = await _advance_repeating(docs, datetime.now(timezone.utc))
+    docs.sort(key=lambda doc: from_mongo(doc["next_fire_at"]))
+
     reminders = []
-    async for doc in cursor:
+    for doc in docs:
         reminders.append(ReminderResponse(
             id=str(doc["_id"]),
             user_id=doc["user_id"],
             title=doc["title"],
             reminder_type=doc["reminder_type"],
             target_id=doc.get("target_id"),
-            reminder_time=datetime.fromisoformat(doc["reminder_time"]),
+            reminder_time=from_mongo(doc["reminder_time"]),
             repeat=doc.get("repeat"),
             created_at=doc["created_at"]
         ))
     return reminders
 
+def _expand(doc: dict, start: datetime, end: datetime):
+    # reminder_time is the series anchor; next_fire_at moves forward as occurrences pass
+    anchor = from_mongo(doc["reminder_time"])
+    for fire_at in iter_occurrences(anchor, doc["repeat"], start, end):
+        yield fire_at, doc
+
+# Get the next N reminder occurrences in a time window
+@router.get("/upcoming", response_model=list[UpcomingReminderResponse])
+async def get_upcoming_reminders(
+    from_time: Optional[datetime] = Query(None, alias="from"),
+    to_time: Optional[datetime] = Query(None, alias="to"),
+    limit: int = Query(20, ge=1, le=200),
+    current_user: dict = Depends(get_current_user)
+):
+    start = to_utc(from_time) if from_time else datetime.now(timezone.utc)
+    end = to_utc(to_time) if to_time else start + timedelta(days=30)
+    if end < start:
+        raise HTTPException(status_code=400, detail="'to' must not be earlier than 'from'")
+
+    user_id = str(current_user["_id"])
+
+    one_off = await storage.reminders.one_off_between(user_id, start, end, limit)
+    series = [[(from_mongo(doc["next_fire_at"]), doc) for doc in one_off]]
+    repeating = await storage.reminders.repeating_for_user(user_id, end)
+    for doc in await _advance_repeating(repeating, datetime.now(timezone.utc)):
+        series.append(_expand(doc, start, end))
+
+    # Merge the per-reminder series lazily so only `limit` occurrences are ever expanded
+    merged = heapq.merge(*series, key=lambda item: item[0])
+    upcoming = []
+    for fire_at, doc in itertools.islice(merged, limit):
+        upcoming.append(UpcomingReminderResponse(
+            id=str(doc["_id"]),
+            user_id=doc["user_id"],
+            title=doc["title"],
+            reminder_type=doc["reminder_type"],
+            target_id=doc.get("target_id"),
+            reminder_time=from_mongo(doc["reminder_time"]),
+            repeat=doc.get("repeat"),
+            created_at=doc["created_at"],
+            fire_at=fire_at
+        ))
+    return upcoming
+
 # Update reminder
 @router.put("/{reminder_id}", response_model=ReminderResponse)
 async def update_reminder(reminder_id: str, update_data: ReminderUpdate, current_user: dict = Depends(get_current_user)):
@@ -71,11 +145,18 @@ async def update_reminder(reminder_id: str, update_data: ReminderUpdate, current
     if not update_dict:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    reminder = await reminders_collection.find_one_and_update(
-        {"_id": ObjectId(reminder_id), "user_id": str(current_user["_id"])},
-        {"$set": update_dict},
-        return_document=True
-    )
+    if "reminder_time" in update_dict or "repeat" in update_dict:
+        existing = await storage.reminders.get(reminder_id, str(current_user["_id"]))
+        if not existing:
+            raise HTTPException(status_code=404, detail="Reminder not found")
+
+        if "reminder_time" in update_dict:
+            update_dict["reminder_time"] = to_utc(update_dict["reminder_time"])
+        reminder_time = update_dict.get("reminder_time") or from_mongo(existing["reminder_time"])
+        repeat = update_dict.get("repeat", existing.get("repeat"))
+        update_dict["next_fire_at"] = next_occurrence(reminder_time, repeat, datetime.now(timezone.utc))
+
+    reminder = await storage.reminders.update(reminder_id, str(current_user["_id"]), update_dict)
 
     if not reminder:
         raise HTTPException(status_code=404, detail="Reminder not found")
@@ -95,7 +176,7 @@ async def update_reminder(reminder_id: str, update_data: ReminderUpdate, current
         title=reminder["title"],
         reminder_type=reminder["reminder_type"],
         target_id=reminder.get("target_id"),
-        reminder_time=datetime.fromisoformat(reminder["reminder_time"]),
+        reminder_time=from_mongo(reminder["reminder_time"]),
         repeat=reminder.get("repeat"),
         created_at=reminder["created_at"]
     )
@@ -103,7 +184,7 @@ async def update_reminder(reminder_id: str, update_data: ReminderUpdate, current
 # Delete reminder
 @router.delete("/{reminder_id}")
 async def delete_reminder(reminder_id: str, current_user: dict = Depends(get_current_user)):
-    result = await reminders_collection.delete_one({"_id": ObjectId(reminder_id), "user_id": str(current_user["_id"])})
+    deleted = await storage.reminders.delete(reminder_id, str(current_user["_id"]))
 
     # Remove the job from scheduler if exists
     from app.utils.scheduler import scheduler
@@ -112,7 +193,7 @@ async def delete_reminder(reminder_id: str, current_user: dict = Depends(get_cur
     except Exception:
         pass
 
-    if result.deleted_count == 0:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Reminder not found")
 
     return {"msg": "Reminder deleted successfully"}
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi.security import OAuth2PasswordBearer
 from app.models.user import UserResponse, UserUpdate, ChangePasswordRequest
 from app.utils.security import get_current_user, hash_password, verify_password
-from app.database import users_collection, blacklist_collection
-from bson import ObjectId
+from app.storage import storage
+from app.utils.cleanup import purge_user
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+
 # Get User Profile
 @router.get("/me", response_model=UserResponse)
 async def get_user_profile(current_user: dict = Depends(get_current_user)):
@@ -24,21 +27,14 @@ async def update_user_profile(update_data: UserUpdate, current_user: dict = Depe
 
     # If email is being updated, check uniqueness
     if "email" in update_dict:
-        existing = await users_collection.find_one({"email": update_dict["email"]})
+        existing = await storage.users.get_by_email(update_dict["email"])
         if existing and str(existing["_id"]) != str(current_user["_id"]):
             raise HTTPException(status_code=400, detail="Email already in use")
 
         # Invalidate tokens when email changes
-        await blacklist_collection.insert_one({
-            "user_id": str(current_user["_id"]),
-            "reason": "email_changed"
-        })
+        await storage.tokens.revoke_user(str(current_user["_id"]), "email_changed")
 
-    result = await users_collection.find_one_and_update(
-        {"_id": ObjectId(current_user["_id"])},
-        {"$set": update_dict},
-        return_document=True
-    )
+    result = await storage.users.update(str(current_user["_id"]), update_dict)
 
     return UserResponse(
         id=str(result["_id"]),
@@ -55,15 +51,25 @@ async def change_password(request: ChangePasswordRequest, current_user: dict = D
 
     # Update password
     new_hashed_pw = hash_password(request.new_password)
-    await users_collection.update_one(
-        {"_id": ObjectId(current_user["_id"])},
-        {"$set": {"password": new_hashed_pw}}
-    )
+    await storage.users.update(str(current_user["_id"]), {"password": new_hashed_pw})
 
     # Invalidate all tokens for this user
-    await blacklist_collection.insert_one({
-        "user_id": str(current_user["_id"]),
-        "reason": "password_changed"
-    })
+    await storage.tokens.revoke_user(str(current_user["_id"]), "password_changed")
 
     return {"msg": "Password updated successfully. Please log in again."}
+
+# Delete Account
+@router.delete("/me")
+async def delete_account(
+    background_tasks: BackgroundTasks,
+    token: str = Depends(oauth2_scheme),
+    current_user: dict = Depends(get_current_user)
+):
+    user_id = str(current_user["_id"])
+    await storage.users.delete(user_id)
+    await storage.tokens.revoke(token)
+
+    # Habits, logs, reminders and wellness data are removed in batches in the background
+    background_tasks.add_task(purge_user, user_id)
+
+    return {"msg": "Account deleted successfully"}
@@ -1,13 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.models.wellness import WellnessLogCreate, WellnessLogUpdate, WellnessLogResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Header
+from app.models.wellness import WellnessLogCreate, WellnessLogUpdate, WellnessLogResponse, IngestResponse
 from app.utils.security import get_current_user
-from app.database import db
-from bson import ObjectId
+from app.storage import storage
+from app.utils.sketches import record_wellness_log, replace_wellness_log
+from app.utils.wellness_archive import archived_summaries, summary_averages, archive_cutoff
+from app.utils.ingest import DailyAggregator, flush_day, MAX_INGEST_SAMPLES, MAX_INGEST_LINE_BYTES, INGEST_LEASE_SECONDS
+from typing import Optional
 from datetime import datetime, date
 
 router = APIRouter(prefix="/wellness/logs", tags=["Wellness"])
 
-wellness_collection = db["wellness_logs"]
+def _rounded(value, digits=None):
+    return round(value, digits) if value is not None else None
+
+def archived_response(doc: dict) -> WellnessLogResponse:
+    averages = summary_averages(doc)
+    return WellnessLogResponse(
+        id=str(doc["_id"]),
+        user_id=doc["user_id"],
+        sleep_hours=_rounded(averages["sleep_hours"], 2),
+        water_intake_liters=_rounded(averages["water_intake_liters"], 2),
+        steps=_rounded(averages["steps"]),
+        mood=averages["mood"],
+        date=datetime.fromisoformat(doc["start"]),
+        period=doc["period"],
+        days_logged=doc["days"]
+    )
 
 # Add wellness log
 @router.post("/", response_model=WellnessLogResponse)
@@ -15,7 +33,7 @@ async def add_wellness_log(log: WellnessLogCreate, current_user: dict = Depends(
     today = datetime.utcnow().date()
 
     # Prevent multiple logs for same user & date
-    existing_log = await wellness_collection.find_one({"user_id": str(current_user["_id"]), "date": today.isoformat()})
+    existing_log = await storage.wellness.get_by_date(str(current_user["_id"]), today.isoformat())
     if existing_log:
         raise HTTPException(status_code=400, detail="Wellness log for today already exists")
 
@@ -27,10 +45,14 @@ async def add_wellness_log(log: WellnessLogCreate, current_user: dict = Depends(
         "mood": log.mood,
         "date": today.isoformat()
     }
-    result = await wellness_collection.insert_one(new_log)
+    log_id = await storage.wellness.create(new_log)
+    if log_id is None:
+        # A wearable sync created today's log between the check above and the insert
+        raise HTTPException(status_code=400, detail="Wellness log for today already exists")
+    await record_wellness_log(new_log)
 
     return WellnessLogResponse(
-        id=str(result.inserted_id),
+        id=log_id,
         user_id=new_log["user_id"],
         sleep_hours=new_log["sleep_hours"],
         water_intake_liters=new_log["water_intake_liters"],
@@ -39,18 +61,80 @@ async def add_wellness_log(log: WellnessLogCreate, current_user: dict = Depends(
         date=today
     )
 
+# Stream wearable samples (NDJSON, one sample per line) into daily logs
+@router.post("/ingest", response_model=IngestResponse)
+async def ingest_wearable_samples(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=128),
+    current_user: dict = Depends(get_current_user)
+):
+    user_id = str(current_user["_id"])
+
+    # A retried upload with the same key gets the original result instead of being counted twice.
+    # If an earlier attempt failed or died part-way, it runs again: each day records the key in the
+    # same upsert that merges it, so days that were already merged are skipped.
+    if idempotency_key:
+        claimed, previous = await storage.ingest_keys.claim(user_id, idempotency_key, INGEST_LEASE_SECONDS)
+        if not claimed:
+            if previous.get("status") == "done":
+                return IngestResponse(**previous["result"], duplicate=True)
+            raise HTTPException(status_code=409, detail="An upload with this idempotency key is in progress")
+
+    try:
+        aggregator = DailyAggregator()
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                aggregator.add_line(line)
+            if len(buffer) > MAX_INGEST_LINE_BYTES:
+                raise HTTPException(status_code=413, detail=f"Sample line too long (max {MAX_INGEST_LINE_BYTES} bytes)")
+            if aggregator.accepted + aggregator.rejected > MAX_INGEST_SAMPLES:
+                raise HTTPException(status_code=413, detail=f"Too many samples (max {MAX_INGEST_SAMPLES})")
+        aggregator.add_line(buffer)
+
+        # Archived days no longer have a daily document to merge into
+        cutoff = archive_cutoff(datetime.utcnow().date()).isoformat()
+        accepted, rejected = aggregator.accepted, aggregator.rejected
+        days_updated = []
+        for day, totals in sorted(aggregator.days.items()):
+            if day < cutoff:
+                accepted -= totals["samples"]
+                rejected += totals["samples"]
+                continue
+            await flush_day(user_id, day, totals["inc"], totals["max"], idempotency_key)
+            days_updated.append(day)
+
+        if any(day < datetime.utcnow().date().isoformat() for day in days_updated):
+            await storage.analytics_cache.invalidate(user_id)
+    except BaseException:
+        if idempotency_key:
+            await storage.ingest_keys.fail(user_id, idempotency_key)
+        raise
+
+    result = {"accepted": accepted, "rejected": rejected, "days_updated": days_updated}
+    if idempotency_key:
+        await storage.ingest_keys.finish(user_id, idempotency_key, result)
+    return IngestResponse(**result)
+
 # Get all wellness logs for user
 @router.get("/", response_model=list[WellnessLogResponse])
-async def get_all_wellness_logs(current_user: dict = Depends(get_current_user)):
-    cursor = wellness_collection.find({"user_id": str(current_user["_id"])})
-    logs = []
-    async for doc in cursor:
+async def get_all_wellness_logs(
+    archive_period: str = Query("month", pattern="^(week|month)$"),
+    current_user: dict = Depends(get_current_user)
+):
+    # Archived history comes back as weekly/monthly summaries, followed by the raw daily logs
+    archived = await archived_summaries(str(current_user["_id"]), archive_period)
+    logs = [archived_response(doc) for doc in archived]
+
+    for doc in await storage.wellness.list_for_user(str(current_user["_id"])):
         logs.append(WellnessLogResponse(
             id=str(doc["_id"]),
             user_id=doc["user_id"],
-            sleep_hours=doc["sleep_hours"],
-            water_intake_liters=doc["water_intake_liters"],
-            steps=doc["steps"],
+            sleep_hours=doc.get("sleep_hours"),
+            water_intake_liters=doc.get("water_intake_liters"),
+            steps=doc.get("steps"),
             mood=doc.get("mood"),
             date=datetime.fromisoformat(doc["date"])
         ))
@@ -64,16 +148,20 @@ async def get_wellness_log_by_date(log_date: str, current_user: dict = Depends(g
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
-    log = await wellness_collection.find_one({"user_id": str(current_user["_id"]), "date": parsed_date.isoformat()})
+    log = await storage.wellness.get_by_date(str(current_user["_id"]), parsed_date.isoformat())
     if not log:
+        # Older days only survive as part of their week's summary
+        week = await storage.wellness_archive.week_containing(str(current_user["_id"]), parsed_date.isoformat())
+        if week:
+            return archived_response(week)
         raise HTTPException(status_code=404, detail="No log found for this date")
 
     return WellnessLogResponse(
         id=str(log["_id"]),
         user_id=log["user_id"],
-        sleep_hours=log["sleep_hours"],
-        water_intake_liters=log["water_intake_liters"],
-        steps=log["steps"],
+        sleep_hours=log.get("sleep_hours"),
+        water_intake_liters=log.get("water_intake_liters"),
+        steps=log.get("steps"),
         mood=log.get("mood"),
         date=datetime.fromisoformat(log["date"])
     )
@@ -85,21 +173,23 @@ async def update_wellness_log(log_id: str, update_data: WellnessLogUpdate, curre
     if not update_dict:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    log = await wellness_collection.find_one_and_update(
-        {"_id": ObjectId(log_id), "user_id": str(current_user["_id"])},
-        {"$set": update_dict},
-        return_document=True
-    )
+    previous = await storage.wellness.update(log_id, str(current_user["_id"]), update_dict)
 
-    if not log:
+    if not previous:
         raise HTTPException(status_code=404, detail="Wellness log not found")
 
+    log = {**previous, **update_dict}
+    await replace_wellness_log(previous, log)
+
+    # Past days changed, so cached correlation stats can no longer be extended incrementally
+    await storage.analytics_cache.invalidate(str(current_user["_id"]))
+
     return WellnessLogResponse(
         id=str(log["_id"]),
         user_id=log["user_id"],
-        sleep_hours=log["sleep_hours"],
-        water_intake_liters=log["water_intake_liters"],
-        steps=log["steps"],
+        sleep_hours=log.get("sleep_hours"),
+        water_intake_liters=log.get("water_intake_liters"),
+        steps=log.get("steps"),
         mood=log.get("mood"),
         date=datetime.fromisoformat(log["date"])
     )
@@ -107,8 +197,12 @@ async def update_wellness_log(log_id: str, update_data: WellnessLogUpdate, curre
 # Delete wellness log
 @router.delete("/{log_id}")
 async def delete_wellness_log(log_id: str, current_user: dict = Depends(get_current_user)):
-    result = await wellness_collection.delete_one({"_id": ObjectId(log_id), "user_id": str(current_user["_id"])})
-    if result.deleted_count == 0:
+    log = await storage.wellness.delete(log_id, str(current_user["_id"]))
+    if not log:
         raise HTTPException(status_code=404, detail="Wellness log not found")
 
+    await record_wellness_log(log, sign=-1)
+
+    await storage.analytics_cache.invalidate(str(current_user["_id"]))
+
     return {"msg": "Wellness log deleted successfully"}
\ No newline at end of file
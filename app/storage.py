@@ -0,0 +1,37 @@
+import importlib
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "mongo" (default) uses Motor; "memory" keeps everything in-process for tests and microbenchmarks
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+
+
+class Storage:
+    """All data access goes through these repositories, whichever backend provides them"""
+
+    def __init__(self, backend: str):
+        module = importlib.import_module(f"app.repositories.{backend}")
+        self.backend = backend
+        self.users = module.UserRepository()
+        self.tokens = module.TokenRepository()
+        self.habits = module.HabitRepository()
+        self.habit_logs = module.HabitLogRepository()
+        self.wellness = module.WellnessLogRepository()
+        self.wellness_archive = module.WellnessArchiveRepository()
+        self.sketches = module.SketchRepository()
+        self.reminders = module.ReminderRepository()
+        self.analytics_cache = module.AnalyticsCacheRepository()
+        self.ingest_keys = module.IngestKeyRepository()
+
+    async def init(self):
+        """Create indexes and run lightweight data migrations on startup"""
+        for repository in (
+            self.users, self.tokens, self.habits, self.habit_logs, self.wellness, self.wellness_archive,
+            self.sketches, self.reminders, self.analytics_cache, self.ingest_keys
+        ):
+            await repository.init()
+
+
+storage = Storage(STORAGE_BACKEND)
@@ -0,0 +1,122 @@
+import asyncio
+import os
+from collections import defaultdict
+from bson import ObjectId
+from app.storage import storage
+from app.utils.scheduler import scheduler
+from app.utils.sketches import sketch_increments
+
+GC_BATCH_SIZE = int(os.getenv("GC_BATCH_SIZE", "500"))
+GC_INTERVAL_HOURS = float(os.getenv("GC_INTERVAL_HOURS", "24"))
+
+
+def unschedule(reminder_ids):
+    for reminder_id in reminder_ids:
+        try:
+            scheduler.remove_job(str(reminder_id))
+        except Exception:
+            pass
+
+
+async def delete_reminders(user_id: str = None, habit_ids: list = None) -> int:
+    """Delete a user's (or some habits') reminders in batches, removing their scheduler jobs too"""
+    deleted = 0
+    while True:
+        ids = await storage.reminders.pop_batch(GC_BATCH_SIZE, user_id=user_id, habit_ids=habit_ids)
+        if not ids:
+            return deleted
+        unschedule(ids)
+        deleted += len(ids)
+
+
+async def purge_habits(habit_ids: list, user_id: str = None):
+    """Remove everything hanging off already-deleted habits: logs, reminders and cached stats"""
+    habit_ids = [str(habit_id) for habit_id in habit_ids]
+    for i in range(0, len(habit_ids), GC_BATCH_SIZE):
+        batch = habit_ids[i:i + GC_BATCH_SIZE]
+        await storage.habit_logs.delete_for_habits(batch)
+        await delete_reminders(habit_ids=batch)
+        await storage.analytics_cache.drop_habits(batch, user_id)
+
+
+async def purge_wellness_logs(user_id: str):
+    """Delete a user's wellness logs in batches and take them back out of the population sketches"""
+    while True:
+        batch = await storage.wellness.pop_batch(user_id, GC_BATCH_SIZE)
+        if not batch:
+            return
+        per_day = defaultdict(lambda: defaultdict(int))
+        for log in batch:
+            for key, value in sketch_increments(log, -1).items():
+                per_day[log["date"]][key] += value
+        await storage.sketches.increment(per_day, upsert=False)
+
+
+async def purge_user(user_id: str):
+    """Account deletion: drop all of a user's data once the user document itself is gone"""
+    while True:
+        ids = await storage.habits.pop_batch_for_user(user_id, GC_BATCH_SIZE)
+        if not ids:
+            break
+        await purge_habits(ids, user_id)
+
+    await storage.habit_logs.delete_for_user(user_id)
+    await delete_reminders(user_id=user_id)
+    await purge_wellness_logs(user_id)
+    await storage.wellness_archive.delete_for_user(user_id)
+    await storage.analytics_cache.invalidate(user_id)
+
+
+async def _sweep(values, existing_ids, purge) -> int:
+    """Stream distinct owner ids and purge, batch by batch, those whose owner is gone.
+
+    purge gets each batch's orphans in one call, so per-batch work isn't repeated per orphan.
+    """
+    removed, batch = 0, []
+
+    async def flush():
+        found = await existing_ids(batch)
+        orphans = [value for value in batch if ObjectId.is_valid(value) and value not in found]
+        if orphans:
+            await purge(orphans)
+        return len(orphans)
+
+    async for value in values:
+        batch.append(value)
+        if len(batch) >= GC_BATCH_SIZE:
+            removed += await flush()
+            batch = []
+    if batch:
+        removed += await flush()
+    return removed
+
+
+async def collect_garbage() -> dict:
+    """Find and remove data whose owning user or habit no longer exists"""
+    async def purge_users(user_ids):
+        for user_id in user_ids:
+            await purge_user(user_id)
+
+    orphan_users = 0
+    for repository in (
+        storage.habits, storage.habit_logs, storage.reminders, storage.wellness, storage.wellness_archive
+    ):
+        orphan_users += await _sweep(repository.distinct_user_ids(), storage.users.existing_ids, purge_users)
+
+    orphan_habits = await _sweep(storage.habit_logs.distinct_habit_ids(), storage.habits.existing_ids, purge_habits)
+    orphan_habits += await _sweep(
+        storage.reminders.distinct_habit_targets(), storage.habits.existing_ids, purge_habits
+    )
+
+    return {"orphan_users": orphan_users, "orphan_habits": orphan_habits}
+
+
+async def run_garbage_collector():
+    """Background loop started with the app; sweeps every GC_INTERVAL_HOURS"""
+    while True:
+        await asyncio.sleep(GC_INTERVAL_HOURS * 3600)
+        try:
+            result = await collect_garbage()
+            print(f"[🧹 Orphan GC] {result}")
+        except Exception as e:
+            print(f"[❌ Orphan GC Error]: {e}")
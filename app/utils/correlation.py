@@ -0,0 +1,117 @@
+import math
+import numpy as np
+
+# Wellness metrics compared against habit completion, with the "good day" threshold used for lift
+METRICS = {
+    "sleep_hours": 7,
+    "steps": 8000,
+    "water_intake_liters": 2,
+    "mood": 4,
+}
+
+MOOD_SCORES = {
+    "terrible": 1, "awful": 1, "sad": 2, "bad": 2, "low": 2, "stressed": 2, "tired": 2,
+    "okay": 3, "ok": 3, "neutral": 3, "fine": 3, "calm": 4, "good": 4, "happy": 4,
+    "great": 5, "excellent": 5, "energetic": 5, "amazing": 5,
+}
+
+STAT_FIELDS = ["n", "sx", "sxx", "sy", "sxy", "high_days", "high_done", "low_days", "low_done"]
+MIN_DAYS = 7
+
+def mood_score(mood):
+    if not mood:
+        return math.nan
+    return MOOD_SCORES.get(mood.strip().lower(), math.nan)
+
+def build_stats(habits: list, habit_logs: list, wellness_logs: list) -> dict:
+    """Aggregate sufficient statistics for every (habit, metric) pair in one vectorised pass.
+
+    Days are aligned on the wellness log dates; a habit only counts from the day it was created.
+    Returns {habit_id: {metric: {field: value}}} that can be added to previously cached stats.
+    """
+    if not habits or not wellness_logs:
+        return {}
+
+    wellness_logs = sorted(wellness_logs, key=lambda log: log["date"])
+    days = np.array([log["date"] for log in wellness_logs], dtype="datetime64[D]")
+    values = {
+        "sleep_hours": np.array([log.get("sleep_hours", math.nan) for log in wellness_logs], dtype=float),
+        "steps": np.array([log.get("steps", math.nan) for log in wellness_logs], dtype=float),
+        "water_intake_liters": np.array([log.get("water_intake_liters", math.nan) for log in wellness_logs], dtype=float),
+        "mood": np.array([mood_score(log.get("mood")) for log in wellness_logs], dtype=float),
+    }
+
+    habit_ids = [str(habit["_id"]) for habit in habits]
+    habit_index = {habit_id: i for i, habit_id in enumerate(habit_ids)}
+    created = np.array([habit["created_at"].date().isoformat() for habit in habits], dtype="datetime64[D]")
+    active = days[None, :] >= created[:, None]
+
+    # Completion matrix (habits x days), filled by matching log dates onto the day axis
+    done = np.zeros((len(habits), len(days)), dtype=bool)
+    logs = [log for log in habit_logs if log["habit_id"] in habit_index]
+    if logs:
+        rows = np.array([habit_index[log["habit_id"]] for log in logs])
+        log_days = np.array([log["date"] for log in logs], dtype="datetime64[D]")
+        cols = np.clip(np.searchsorted(days, log_days), 0, len(days) - 1)
+        matched = days[cols] == log_days
+        done[rows[matched], cols[matched]] = True
+    done &= active
+
+    stats = {habit_id: {} for habit_id in habit_ids}
+    for metric, threshold in METRICS.items():
+        known = ~np.isnan(values[metric])
+        x = np.where(known, values[metric], 0.0)
+        high = (x >= threshold) & known
+        low = ~high & known
+        a = (active & known).astype(float)
+        y = (done & known).astype(float)
+
+        columns = {
+            "n": a.sum(axis=1),
+            "sx": a @ x,
+            "sxx": a @ (x * x),
+            "sy": y.sum(axis=1),
+            "sxy": y @ x,
+            "high_days": a @ high,
+            "high_done": y @ high,
+            "low_days": a @ low,
+            "low_done": y @ low,
+        }
+        for i, habit_id in enumerate(habit_ids):
+            stats[habit_id][metric] = {field: float(columns[field][i]) for field in STAT_FIELDS}
+
+    return stats
+
+def merge_stats(cached: dict, fresh: dict) -> dict:
+    for habit_id, metrics in fresh.items():
+        target = cached.setdefault(habit_id, {})
+        for metric, values in metrics.items():
+            current = target.setdefault(metric, {field: 0.0 for field in STAT_FIELDS})
+            for field in STAT_FIELDS:
+                current[field] = current.get(field, 0.0) + values[field]
+    return cached
+
+def summarize(values: dict) -> dict:
+    """Turn accumulated sums into a Pearson correlation and completion lift"""
+    n = values["n"]
+    correlation = None
+    if n >= MIN_DAYS:
+        var_x = values["sxx"] / n - (values["sx"] / n) ** 2
+        var_y = values["sy"] / n - (values["sy"] / n) ** 2
+        if var_x > 1e-12 and var_y > 1e-12:
+            cov = values["sxy"] / n - (values["sx"] / n) * (values["sy"] / n)
+            correlation = round(cov / math.sqrt(var_x * var_y), 3)
+
+    rate_above = values["high_done"] / values["high_days"] if values["high_days"] else None
+    rate_below = values["low_done"] / values["low_days"] if values["low_days"] else None
+    lift = None
+    if rate_above is not None and rate_below:
+        lift = round((rate_above / rate_below - 1) * 100, 1)
+
+    return {
+        "days": int(n),
+        "correlation": correlation,
+        "completion_rate_above": round(rate_above * 100, 1) if rate_above is not None else None,
+        "completion_rate_below": round(rate_below * 100, 1) if rate_below is not None else None,
+        "lift_percent": lift,
+    }
@@ -0,0 +1,39 @@
+from datetime import date, timedelta
+
+# One document per (habit_id, month): bit (day - 1) of "bits" is set when the habit was completed that day
+
+def month_key(day: date) -> str:
+    return day.strftime("%Y-%m")
+
+def day_mask(day: date) -> int:
+    return 1 << (day.day - 1)
+
+def bucket_days(bucket: dict) -> list:
+    """Completed dates recorded in a bucket, oldest first"""
+    year, month = map(int, bucket["month"].split("-"))
+    bits = bucket.get("bits", 0)
+    return [date(year, month, d + 1) for d in range(31) if bits >> d & 1]
+
+def count_between(bucket: dict, start: date, end: date) -> int:
+    """Completions in the bucket falling within [start, end]"""
+    year, month = map(int, bucket["month"].split("-"))
+    first = date(year, month, 1)
+    lo = max(start, first)
+    hi = min(end, (first + timedelta(days=31)).replace(day=1) - timedelta(days=1))
+    if lo > hi:
+        return 0
+    mask = ((1 << (hi.day - lo.day + 1)) - 1) << (lo.day - 1)
+    return bin(bucket.get("bits", 0) & mask).count("1")
+
+def streaks(buckets: list, today: date) -> dict:
+    """Current and longest run of consecutive completed days from a habit's buckets"""
+    days = sorted(day for bucket in buckets for day in bucket_days(bucket))
+    longest = run = 0
+    previous = None
+    for day in days:
+        run = run + 1 if previous and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    # A streak is still current if it reaches today or yesterday (today may not be logged yet)
+    current = run if previous and today - previous <= timedelta(days=1) else 0
+    return {"current_streak": current, "longest_streak": longest}
@@ -0,0 +1,16 @@
+from app.storage import storage
+
+
+async def run_habit_log_migration():
+    """Background task started with the app: moves legacy per-day habit logs into month buckets.
+
+    The API serves requests meanwhile, reading whatever is already bucketed. Analytics cached from
+    that partial view are dropped once the migration is done so they get rebuilt from full history.
+    """
+    try:
+        migrated = await storage.habit_logs.migrate_legacy()
+        if migrated:
+            await storage.analytics_cache.clear()
+            print(f"[🪣 Habit Log Migration] Moved {migrated} legacy logs into month buckets")
+    except Exception as e:
+        print(f"[❌ Habit Log Migration Error]: {e}")
@@ -0,0 +1,100 @@
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pydantic import ValidationError
+from app.models.wellness import WearableSample
+from app.storage import storage
+from app.utils.sketches import record_wellness_log, replace_wellness_log
+
+MAX_INGEST_SAMPLES = int(os.getenv("MAX_INGEST_SAMPLES", "200000"))
+MAX_INGEST_LINE_BYTES = int(os.getenv("MAX_INGEST_LINE_BYTES", "4096"))
+# A pending idempotency key is treated as abandoned (its process died) once this lease runs out
+INGEST_LEASE_SECONDS = float(os.getenv("INGEST_LEASE_SECONDS", "600"))
+MAX_CLOCK_SKEW = timedelta(minutes=5)  # device clocks may run a little ahead; anything later is rejected
+
+# Largest value a single sample may carry; anything above is treated as a device glitch
+SAMPLE_LIMITS = {"steps": 100000, "steps_total": 100000, "sleep": 24, "water": 10}
+
+
+class DailyAggregator:
+    """Folds wearable samples into per-day totals before anything touches the database"""
+
+    def __init__(self):
+        self.days = defaultdict(lambda: {"inc": defaultdict(float), "max": {}, "samples": 0})
+        self.accepted = 0
+        self.rejected = 0
+        self.latest_allowed = datetime.utcnow() + MAX_CLOCK_SKEW
+
+    def add_line(self, line: bytes):
+        line = line.strip()
+        if not line:
+            return
+        if len(line) > MAX_INGEST_LINE_BYTES:
+            self.rejected += 1
+            return
+        # Pydantic's own parser caps nesting depth, so a line like b"[" * 2000 is a ValidationError
+        # rather than the RecursionError json.loads would raise
+        try:
+            sample = WearableSample.model_validate_json(line)
+        except ValidationError:
+            self.rejected += 1
+            return
+        if sample.value > SAMPLE_LIMITS[sample.type]:
+            self.rejected += 1
+            return
+
+        timestamp = sample.timestamp
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        if timestamp > self.latest_allowed:
+            self.rejected += 1
+            return
+        day = self.days[timestamp.date().isoformat()]
+
+        if sample.type == "steps":
+            day["inc"]["steps"] += sample.value
+        elif sample.type == "sleep":
+            day["inc"]["sleep_hours"] += sample.value
+        elif sample.type == "water":
+            day["inc"]["water_intake_liters"] += sample.value
+        else:
+            day["max"]["steps"] = max(day["max"].get("steps", 0), sample.value)
+        day["max"]["last_synced_at"] = max(day["max"].get("last_synced_at", timestamp), timestamp)
+        day["samples"] += 1
+        self.accepted += 1
+
+
+def _apply(log: dict, inc: dict, maximums: dict) -> dict:
+    """What the document looks like after the update, without re-reading it"""
+    after = dict(log)
+    for field, value in inc.items():
+        after[field] = after.get(field, 0) + value
+    for field, value in maximums.items():
+        after[field] = max(after[field], value) if after.get(field) is not None else value
+    return after
+
+
+async def flush_day(user_id: str, day: str, inc: dict, maximums: dict, ingest_key: str = None) -> bool:
+    """Merge one day's totals into the daily wellness document with a single atomic upsert.
+
+    Returns False, without touching anything, if ingest_key was already merged into that day.
+    """
+    if "steps" in inc:
+        inc["steps"] = int(round(inc["steps"]))
+    if "steps" in maximums:
+        maximums["steps"] = int(maximums["steps"])
+    # Only metrics that had samples are written: a missing field means "not tracked that day", which
+    # sketches and correlations skip, whereas a 0 would count as a real (very low) value.
+    # A cumulative steps_total counter takes precedence over step deltas for the same day.
+    increments = {field: value for field, value in inc.items() if field not in maximums}
+
+    applied, before = await storage.wellness.merge_daily(
+        user_id, day, increments, maximums, {"mood": None}, ingest_key
+    )
+    if not applied:
+        return False
+    if before is None:
+        await record_wellness_log(_apply({"user_id": user_id, "date": day}, increments, maximums))
+    else:
+        await replace_wellness_log(before, _apply(before, increments, maximums))
+    return True
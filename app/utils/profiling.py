@@ -0,0 +1,162 @@
+import asyncio
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Event loop block detector: 0 disables it
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+
+# Request profiler: a request is profiled when it carries X-Profile: <PROFILE_ADMIN_TOKEN>,
+# or at random for PROFILE_SAMPLE_PERCENT of requests. Reports are folded stacks (flamegraph.pl / speedscope).
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+PROFILE_SAMPLE_PERCENT = float(os.getenv("PROFILE_SAMPLE_PERCENT", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_REPORTS = int(os.getenv("PROFILE_MAX_REPORTS", "500"))
+PROFILING_ENABLED = bool(PROFILE_ADMIN_TOKEN) or PROFILE_SAMPLE_PERCENT > 0
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    """Path relative to the longest sys.path entry containing it, e.g. starlette/routing.py"""
+    for prefix in sorted((os.path.abspath(p) for p in sys.path), key=len, reverse=True):
+        if filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+class LoopBlockMonitor:
+    """Logs the event loop's stack whenever a single callback holds it for longer than threshold_ms"""
+
+    def __init__(self, threshold_ms: float):
+        self.threshold = threshold_ms / 1000
+        self.interval = self.threshold / 2
+        self.beats = 0
+        self.last_beat = time.monotonic()
+        self.loop_thread_id = None
+        self.task = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Call from inside the running loop"""
+        self.loop_thread_id = threading.get_ident()
+        self.task = asyncio.create_task(self._heartbeat())
+        threading.Thread(target=self._watch, name="loop-block-monitor", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self.task:
+            self.task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            self.last_beat = time.monotonic()
+            self.beats += 1
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - self.last_beat - self.interval
+            if lag > self.threshold:
+                print(f"[🐢 Event Loop Blocked] Loop was unresponsive for {lag * 1000:.0f}ms")
+
+    def _watch(self):
+        # Runs in its own thread, so it can see the loop while the loop itself is stuck
+        reported = None
+        while not self._stopped.wait(self.interval):
+            blocked = time.monotonic() - self.last_beat - self.interval
+            if blocked <= self.threshold or reported == self.beats:
+                continue
+            reported = self.beats
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "(no frame)\n"
+            print(f"[🐢 Event Loop Blocked] {blocked * 1000:.0f}ms and counting, loop is in:\n{stack}", end="")
+
+
+class StackSampler:
+    """Samples one thread's stack from a side thread and counts identical stacks"""
+
+    def __init__(self, thread_id: int, interval_ms: float):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def should_profile(request) -> bool:
+    token = request.headers.get("x-profile")
+    # compare_digest only accepts ASCII str, so compare bytes to keep odd header values from raising
+    if token and PROFILE_ADMIN_TOKEN and hmac.compare_digest(token.encode(), PROFILE_ADMIN_TOKEN.encode()):
+        return True
+    return PROFILE_SAMPLE_PERCENT > 0 and random.random() * 100 < PROFILE_SAMPLE_PERCENT
+
+
+def save_report(method: str, path: str, elapsed_ms: float, folded: str) -> str:
+    """Write one report and drop the oldest beyond PROFILE_MAX_REPORTS; returns the file name"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-") or "root"
+    name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}_{method}_{slug}_{elapsed_ms:.0f}ms.folded"
+    with open(os.path.join(PROFILE_DIR, name), "w") as f:
+        f.write(folded)
+
+    reports = sorted(entry for entry in os.listdir(PROFILE_DIR) if entry.endswith(".folded"))
+    for old in reports[:-PROFILE_MAX_REPORTS]:
+        os.remove(os.path.join(PROFILE_DIR, old))
+    return name
+
+
+async def profile_request(request, call_next):
+    """HTTP middleware: sample the loop's stack while an opted-in request is in flight.
+
+    Requests share the loop, so a report also shows whatever else ran concurrently.
+    """
+    if not should_profile(request):
+        return await call_next(request)
+
+    sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS)
+    started = time.perf_counter()
+    sampler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        await asyncio.to_thread(sampler.stop)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    name = await asyncio.to_thread(save_report, request.method, request.url.path, elapsed_ms, sampler.folded())
+    response.headers["X-Profile-Report"] = name
+    print(f"[🔬 Profile Saved] {request.method} {request.url.path} | {elapsed_ms:.0f}ms | {name}")
+    return response
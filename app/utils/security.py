@@ -1,8 +1,7 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
-from app.database import users_collection, blacklist_collection
-from bson import ObjectId
+from app.storage import storage
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
@@ -31,8 +30,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     # 1. Check if token is blacklisted
-    blacklisted = await blacklist_collection.find_one({"token": token})
-    if blacklisted:
+    if await storage.tokens.is_revoked(token):
         raise HTTPException(status_code=401, detail="Token has been revoked. Please log in again.")
 
     # 2. Decode JWT
@@ -45,7 +43,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
     # 3. Fetch user from DB
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await storage.users.get(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -0,0 +1,74 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from app.storage import storage
+
+# Fixed-width histograms: mergeable by adding counts and updatable with atomic increments.
+# metric -> (bin width, number of bins); values past the last bin land in it.
+SKETCH_BINS = {
+    "sleep_hours": (0.25, 97),
+    "steps": (250, 201),
+    "water_intake_liters": (0.1, 101),
+}
+
+WINDOWS = {"day": 1, "7d": 7, "30d": 30}
+
+def bin_index(metric: str, value) -> int:
+    width, bins = SKETCH_BINS[metric]
+    # The small epsilon keeps exact multiples (e.g. 1.0 / 0.1) from falling into the bin below
+    return min(max(int(value / width + 1e-9), 0), bins - 1)
+
+def sketch_increments(log: dict, sign: int = 1) -> dict:
+    """Increments adding (or removing, with sign=-1) one wellness log from its day's sketch"""
+    inc = {"count": sign}
+    for metric in SKETCH_BINS:
+        if log.get(metric) is not None:
+            inc[f"{metric}.{bin_index(metric, log[metric])}"] = sign
+    return inc
+
+async def record_wellness_log(log: dict, sign: int = 1):
+    await storage.sketches.increment({log["date"]: sketch_increments(log, sign)})
+
+async def replace_wellness_log(old: dict, new: dict):
+    """Move a log between bins after an update, in a single atomic increment"""
+    inc = defaultdict(int)
+    for key, value in sketch_increments(old, -1).items():
+        inc[key] += value
+    for key, value in sketch_increments(new, 1).items():
+        inc[key] += value
+    inc = {key: value for key, value in inc.items() if value}
+    if inc:
+        await storage.sketches.increment({new["date"]: inc})
+
+async def load_daily_sketches(start: date, end: date) -> dict:
+    """Daily sketches in [start, end] as {date: {metric: [count per bin]}}"""
+    sketches = {}
+    for doc in await storage.sketches.list_between(start.isoformat(), end.isoformat()):
+        counts = {metric: [0] * bins for metric, (_, bins) in SKETCH_BINS.items()}
+        for metric in SKETCH_BINS:
+            for index, count in doc.get(metric, {}).items():
+                counts[metric][int(index)] += count
+        sketches[doc["date"]] = counts
+    return sketches
+
+def percentile(counts: list, metric: str, value) -> float:
+    """Share of the population below value, counting half of its own bin"""
+    total = sum(counts)
+    if not total:
+        return None
+    index = bin_index(metric, value)
+    below = sum(counts[:index]) + counts[index] / 2
+    return round(below / total * 100, 1)
+
+async def rebuild_wellness_sketches():
+    """Backfill sketches from wellness_logs in one streamed pass (memory is bounded by days x bins)"""
+    per_day = defaultdict(lambda: defaultdict(int))
+    async for log in storage.wellness.iter_all():
+        for key, value in sketch_increments(log).items():
+            per_day[log["date"]][key] += value
+
+    await storage.sketches.clear()
+    await storage.sketches.increment(per_day)
+
+async def ensure_wellness_sketches():
+    if await storage.sketches.is_empty():
+        await rebuild_wellness_sketches()
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+import pytz
+
+IST = pytz.timezone("Asia/Kolkata")
+
+REPEAT_INTERVALS = {
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+}
+
+def to_utc(value):
+    """Normalise a datetime (or legacy ISO string) to an aware UTC datetime.
+
+    Naive values are treated as IST, matching the scheduler timezone. Use
+    from_mongo for values read back from the database.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = IST.localize(value)
+    return value.astimezone(timezone.utc)
+
+def from_mongo(value):
+    """Mongo hands back naive UTC datetimes; legacy docs may still hold strings."""
+    if value is None:
+        return None
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return to_utc(value)
+
+def next_occurrence(anchor: datetime, repeat, after: datetime) -> datetime:
+    """First occurrence of a (possibly repeating) reminder at or after `after`"""
+    interval = REPEAT_INTERVALS.get(repeat)
+    if interval is None or anchor >= after:
+        return anchor
+    steps = -(-(after - anchor) // interval)  # ceil division
+    return anchor + steps * interval
+
+def iter_occurrences(anchor: datetime, repeat, start: datetime, end: datetime):
+    """Lazily yield occurrences in [start, end] without materialising the series"""
+    current = next_occurrence(anchor, repeat, start)
+    interval = REPEAT_INTERVALS.get(repeat)
+    while current <= end:
+        yield current
+        if interval is None:
+            return
+        current += interval
@@ -0,0 +1,91 @@
+import asyncio
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta
+from app.storage import storage
+
+# Raw daily logs are the hot tier. Whole months older than ARCHIVE_AFTER_DAYS are rolled up into
+# weekly and monthly summary documents (the archive tier) and the raw logs are dropped.
+ARCHIVE_AFTER_DAYS = int(os.getenv("WELLNESS_ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("WELLNESS_ARCHIVE_INTERVAL_HOURS", "24"))
+
+METRICS = ["sleep_hours", "steps", "water_intake_liters"]
+
+def archive_cutoff(today: date) -> date:
+    """Logs dated before this day are archived; it is always a month start so months roll up whole"""
+    return (today - timedelta(days=ARCHIVE_AFTER_DAYS)).replace(day=1)
+
+def next_month(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=31)).replace(day=1)
+
+def summarize_logs(logs: list) -> dict:
+    moods = Counter(log["mood"] for log in logs if log.get("mood"))
+    summary = {"days": len(logs), "moods": dict(moods)}
+    for metric in METRICS:
+        values = [log[metric] for log in logs if log.get(metric) is not None]
+        summary[metric] = sum(values)
+        summary[f"{metric}_days"] = len(values)  # days that actually tracked the metric
+    return summary
+
+def summary_averages(doc: dict) -> dict:
+    averages = {}
+    for metric in METRICS:
+        days = doc.get(f"{metric}_days", doc["days"])  # summaries archived before per-metric counts
+        averages[metric] = doc[metric] / days if days else None
+    moods = doc.get("moods") or {}
+    averages["mood"] = max(moods, key=moods.get) if moods else None
+    return averages
+
+async def archive_month(user_id: str, month_start: date, logs: list):
+    """Write the month's summaries with $set (so a replay is harmless), then drop its raw logs"""
+    month_end = next_month(month_start) - timedelta(days=1)
+
+    # Weeks start on Monday and are clipped to the month so each month archives independently
+    weeks = {}
+    for log in logs:
+        day = date.fromisoformat(log["date"])
+        week_start = max(day - timedelta(days=day.weekday()), month_start)
+        weeks.setdefault(week_start, []).append(log)
+
+    periods = [("month", month_start, month_end, logs)] + [
+        ("week", start, min(start + timedelta(days=6 - start.weekday()), month_end), week_logs)
+        for start, week_logs in weeks.items()
+    ]
+    await storage.wellness_archive.save(user_id, [
+        (period, start.isoformat(), {"end": end.isoformat(), **summarize_logs(period_logs)})
+        for period, start, end, period_logs in periods
+    ])
+    await storage.wellness.delete_range(user_id, month_start.isoformat(), next_month(month_start).isoformat())
+
+async def roll_up_wellness_logs() -> int:
+    """Stream logs past the cutoff in (user, date) order, holding one user-month in memory at a time"""
+    cutoff = archive_cutoff(datetime.utcnow().date())
+    archived, current, pending = 0, None, []
+    async for log in storage.wellness.iter_before(cutoff.isoformat()):
+        key = (log["user_id"], date.fromisoformat(log["date"]).replace(day=1))
+        if key != current and pending:
+            await archive_month(*current, pending)
+            archived += 1
+            pending = []
+        current = key
+        pending.append(log)
+    if pending:
+        await archive_month(*current, pending)
+        archived += 1
+    return archived
+
+async def archived_summaries(user_id: str, period: str, start: date = None, end: date = None) -> list:
+    return await storage.wellness_archive.list_for_user(
+        user_id, period, start.isoformat() if start else None, end.isoformat() if end else None
+    )
+
+async def run_wellness_archiver():
+    """Background loop started with the app; rolls up old logs every ARCHIVE_INTERVAL_HOURS"""
+    while True:
+        try:
+            months = await roll_up_wellness_logs()
+            if months:
+                print(f"[🗄️ Wellness Archive] Rolled up {months} user-months")
+        except Exception as e:
+            print(f"[❌ Wellness Archive Error]: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL_HOURS * 3600)
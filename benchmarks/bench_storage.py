@@ -0,0 +1,60 @@
+"""Microbenchmark of the hot repository calls on the in-memory backend.
+
+    python benchmarks/bench_storage.py [users] [days]
+
+Times the storage layer itself (index lookups, bit sets, merges), not MongoDB round trips.
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+os.environ["STORAGE_BACKEND"] = "memory"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.storage import Storage
+
+
+def report(name: str, calls: int, seconds: float):
+    print(f"{name:<32} {calls:>8} calls  {seconds * 1e6 / calls:8.2f} µs/call")
+
+
+async def timed(name: str, calls):
+    started = time.perf_counter()
+    count = 0
+    for call in calls:
+        await call
+        count += 1
+    report(name, count, time.perf_counter() - started)
+
+
+async def main(users: int, days: int):
+    storage = Storage("memory")
+    first = date(2026, 1, 1)
+    user_ids = [f"user-{i}" for i in range(users)]
+    habit_ids = [f"habit-{i}" for i in range(users)]
+    dates = [(first + timedelta(days=d)).isoformat() for d in range(days)]
+
+    await timed("habit_logs.log_completion", (
+        storage.habit_logs.log_completion(habit_id, user_id, first + timedelta(days=d))
+        for user_id, habit_id in zip(user_ids, habit_ids) for d in range(days)
+    ))
+    await timed("habit_logs.buckets_for_user", (storage.habit_logs.buckets_for_user(u) for u in user_ids))
+    await timed("wellness.merge_daily", (
+        storage.wellness.merge_daily(u, day, {"sleep_hours": 7.5}, {"steps": 8000}, {"mood": "neutral"}, "bench")
+        for u in user_ids for day in dates
+    ))
+    await timed("wellness.merge_daily (dup key)", (
+        storage.wellness.merge_daily(u, dates[0], {"sleep_hours": 7.5}, {}, {}, "bench") for u in user_ids
+    ))
+    await timed("wellness.list_for_user (<=30d)", (
+        storage.wellness.list_for_user(u, dates[-min(30, days)], dates[-1], ["date", "steps"]) for u in user_ids
+    ))
+    await timed("wellness.get_by_date", (storage.wellness.get_by_date(u, dates[-1]) for u in user_ids))
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+    asyncio.run(main(users, days))
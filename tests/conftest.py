@@ -0,0 +1,35 @@
+import os
+import sys
+
+# Must be set before anything imports app.storage, so the suite never needs a MongoDB
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("LOOP_BLOCK_THRESHOLD_MS", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.storage import Storage, storage
+from app.utils.security import get_current_user
+
+
+@pytest.fixture(autouse=True)
+def fresh_storage():
+    """Swap in empty repositories; the routes hold a reference to the same storage object"""
+    storage.__dict__.update(Storage("memory").__dict__)
+    yield storage
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        user_id = client.portal.call(storage.users.create, {"username": "tester", "email": "tester@example.com", "password": "x"})
+        user = client.portal.call(storage.users.get, user_id)
+
+        async def current_user():
+            return user
+
+        app.dependency_overrides[get_current_user] = current_user
+        client.user_id = user_id
+        yield client
+    app.dependency_overrides.clear()
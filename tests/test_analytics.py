@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+from app.storage import storage
+from app.utils.sketches import record_wellness_log
+from app.utils.wellness_archive import roll_up_wellness_logs
+
+
+def days_ago(days: int) -> str:
+    return (datetime.utcnow().date() - timedelta(days=days)).isoformat()
+
+
+def add_log(client, user_id: str, day: str, **metrics):
+    """Store a wellness log the way the routes do, including its population sketch"""
+    log = {"user_id": user_id, "date": day, **metrics}
+    client.portal.call(storage.wellness.create, log)
+    client.portal.call(record_wellness_log, log)
+
+
+def test_percentiles_for_two_users_on_one_day(client):
+    client.post("/wellness/logs/", json={"sleep_hours": 8, "water_intake_liters": 2, "steps": 4000, "mood": "good"})
+    add_log(client, "other-user", days_ago(0), sleep_hours=6, water_intake_liters=2, steps=10000, mood="good")
+
+    metrics = client.get("/analytics/percentiles").json()["metrics"]
+    assert metrics["steps"] == {"value": 4000, "percentile": 25.0, "top_percent": 75.0, "days": 1}
+    assert metrics["sleep_hours"]["percentile"] == 75.0
+    assert metrics["water_intake_liters"]["percentile"] == 50.0
+
+
+def test_percentiles_over_a_window_average_daily_ranks(client):
+    add_log(client, client.user_id, days_ago(0), steps=4000)
+    add_log(client, "other-user", days_ago(0), steps=10000)
+    add_log(client, client.user_id, days_ago(1), steps=6000)
+    add_log(client, "other-user", days_ago(1), steps=2000)
+
+    steps = client.get("/analytics/percentiles", params={"window": "7d"}).json()["metrics"]["steps"]
+    assert steps == {"value": 5000, "percentile": 50.0, "top_percent": 50.0, "days": 2}
+
+    other_day = client.get("/analytics/percentiles", params={"date": days_ago(1)}).json()["metrics"]["steps"]
+    assert other_day["percentile"] == 75.0
+
+
+def test_streaks(client):
+    habits = [client.post("/habits/", json={"name": name, "frequency": "daily"}).json()["id"] for name in ("Run", "Read")]
+    today = datetime.utcnow().date()
+    for days in (7, 6, 5, 4, 1, 0):
+        client.portal.call(storage.habit_logs.log_completion, habits[0], client.user_id, today - timedelta(days=days))
+    client.portal.call(storage.habit_logs.log_completion, habits[1], client.user_id, today - timedelta(days=3))
+
+    assert client.get("/analytics/streaks").json()["habit_streaks"] == [
+        {"habit_name": "Run", "current_streak": 2, "longest_streak": 4},
+        {"habit_name": "Read", "current_streak": 0, "longest_streak": 1},
+    ]
+
+
+def test_correlations_fold_new_days_into_the_cache(client):
+    created = datetime.utcnow() - timedelta(days=30)
+    habit_id = client.portal.call(
+        storage.habits.create, {"user_id": client.user_id, "name": "Run", "frequency": "daily", "created_at": created}
+    )
+
+    def seed(days):
+        # The habit is done exactly on the well-slept days, a perfect correlation
+        for n in days:
+            slept = 8 if n % 2 else 6
+            add_log(client, client.user_id, days_ago(n), sleep_hours=slept)
+            if slept >= 7:
+                client.portal.call(storage.habit_logs.log_completion, habit_id, client.user_id, datetime.fromisoformat(days_ago(n)).date())
+
+    def sleep_correlation():
+        correlations = client.get("/analytics/correlations").json()["correlations"]
+        return next(item for item in correlations if item["metric"] == "sleep_hours")
+
+    seed(range(14, 7, -1))
+    assert sleep_correlation()["days"] == 7
+    cache = client.portal.call(storage.analytics_cache.get, client.user_id)
+    assert cache["through"] == days_ago(1)
+
+    # Rewind the cache to the last seeded day; the next call must fold in only the days after it
+    client.portal.call(storage.analytics_cache.save, client.user_id, cache["stats"], days_ago(8))
+    seed(range(7, 0, -1))
+    result = sleep_correlation()
+    assert result["days"] == 14
+    assert result["correlation"] == 1.0
+    assert (result["completion_rate_above"], result["completion_rate_below"]) == (100.0, 0.0)
+
+    # Once cached through yesterday, past days are served from the cache without re-reading logs
+    client.portal.call(storage.wellness.delete_range, client.user_id, days_ago(30), days_ago(0))
+    assert sleep_correlation()["days"] == 14
+
+
+def test_archived_weeks_feed_day_lookups_and_trends(client):
+    # 2024-01-01 is a Monday, and well past the archive cutoff
+    add_log(client, client.user_id, "2024-01-01", sleep_hours=6, steps=4000, water_intake_liters=2, mood="good")
+    add_log(client, client.user_id, "2024-01-03", sleep_hours=8, steps=6000, mood="good")
+    add_log(client, client.user_id, "2024-01-08", sleep_hours=7, steps=10000, water_intake_liters=3, mood="bad")
+    client.post("/wellness/logs/", json={"sleep_hours": 9, "water_intake_liters": 1, "steps": 8000, "mood": "great"})
+
+    assert client.portal.call(roll_up_wellness_logs) == 1
+    assert [log["date"] for log in client.portal.call(storage.wellness.list_for_user, client.user_id)] == [days_ago(0)]
+
+    week = client.get("/wellness/logs/2024-01-03").json()
+    assert (week["period"], week["date"][:10], week["days_logged"]) == ("week", "2024-01-01", 2)
+    assert (week["sleep_hours"], week["steps"], week["water_intake_liters"], week["mood"]) == (7.0, 5000, 2.0, "good")
+    assert client.get("/wellness/logs/2024-01-20").status_code == 404
+
+    weekly = client.get("/wellness/logs/", params={"archive_period": "week"}).json()
+    assert [(log["period"], log["date"][:10]) for log in weekly] == [
+        ("week", "2024-01-01"), ("week", "2024-01-08"), ("day", days_ago(0))
+    ]
+
+    # Archived weeks count towards long-range trends, each metric over the days that tracked it
+    assert client.get("/analytics/wellness", params={"days": 3650}).json() == {
+        "average_sleep": 7.5,
+        "average_steps": 7000.0,
+        "average_water_intake": 2.0,
+        "mood_trend": ["great"],
+    }
+    assert client.get("/analytics/wellness", params={"days": 30}).json()["average_sleep"] == 9.0
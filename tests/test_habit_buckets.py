@@ -0,0 +1,41 @@
+from datetime import date
+from app.utils.habit_buckets import bucket_days, count_between, day_mask, month_key, streaks
+
+
+def bucket(month: str, *days: int) -> dict:
+    year, number = map(int, month.split("-"))
+    bits = 0
+    for day in days:
+        bits |= day_mask(date(year, number, day))
+    return {"habit_id": "h1", "month": month, "bits": bits}
+
+
+def test_day_bits_round_trip():
+    january = bucket("2026-01", 1, 15, 31)
+    assert month_key(date(2026, 1, 31)) == "2026-01"
+    assert bucket_days(january) == [date(2026, 1, 1), date(2026, 1, 15), date(2026, 1, 31)]
+
+
+def test_count_between_clips_to_each_month():
+    january, february = bucket("2026-01", 1, 30, 31), bucket("2026-02", 1, 2, 28)
+    start, end = date(2026, 1, 31), date(2026, 2, 1)
+
+    assert count_between(january, start, end) == 1
+    assert count_between(february, start, end) == 1
+    assert count_between(february, date(2026, 1, 1), date(2026, 3, 31)) == 3
+    assert count_between(january, date(2026, 2, 1), date(2026, 2, 28)) == 0
+
+
+def test_count_between_handles_december_and_leap_february():
+    december, february = bucket("2025-12", 31), bucket("2024-02", 28, 29)
+
+    assert count_between(december, date(2025, 12, 31), date(2026, 1, 6)) == 1
+    assert count_between(february, date(2024, 2, 29), date(2024, 3, 1)) == 1
+
+
+def test_streaks_run_across_month_boundaries():
+    buckets = [bucket("2026-02", 1, 2), bucket("2026-01", 10, 30, 31)]
+
+    assert streaks(buckets, date(2026, 2, 3)) == {"current_streak": 4, "longest_streak": 4}
+    assert streaks(buckets, date(2026, 2, 4)) == {"current_streak": 0, "longest_streak": 4}
+    assert streaks([], date(2026, 2, 4)) == {"current_streak": 0, "longest_streak": 0}
@@ -0,0 +1,94 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from app.utils.habit_buckets import bucket_days
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_log_completion_sets_each_day_once(fresh_storage):
+    logs = fresh_storage.habit_logs
+    day = date(2026, 10, 5)
+
+    assert run(logs.log_completion("h1", "u1", day)) is True
+    assert run(logs.log_completion("h1", "u1", day)) is False
+    assert run(logs.log_completion("h1", "u1", day + timedelta(days=1))) is True
+
+    [bucket] = run(logs.buckets_for_user("u1"))
+    assert bucket["count"] == 2
+    assert bucket_days(bucket) == [day, day + timedelta(days=1)]
+    assert run(logs.count_completed_on("u1", day)) == 1
+
+
+def test_merge_daily_increments_and_keeps_maximum(fresh_storage):
+    wellness = fresh_storage.wellness
+
+    applied, before = run(wellness.merge_daily("u1", "2026-10-05", {"sleep_hours": 7}, {"steps": 4000}, {"mood": "neutral"}))
+    assert (applied, before) == (True, None)
+
+    applied, before = run(wellness.merge_daily("u1", "2026-10-05", {"sleep_hours": 1}, {"steps": 2500}, {"mood": "neutral"}))
+    assert applied is True
+    assert before["sleep_hours"] == 7 and before["steps"] == 4000
+
+    log = run(wellness.get_by_date("u1", "2026-10-05"))
+    assert log["sleep_hours"] == 8
+    assert log["steps"] == 4000
+    assert "water_intake_liters" not in log
+
+
+def test_merge_daily_skips_a_key_it_already_applied(fresh_storage):
+    wellness = fresh_storage.wellness
+
+    assert run(wellness.merge_daily("u1", "2026-10-05", {"steps": 100}, {}, {}, "key-1"))[0] is True
+    assert run(wellness.merge_daily("u1", "2026-10-05", {"steps": 100}, {}, {}, "key-1")) == (False, None)
+    assert run(wellness.merge_daily("u1", "2026-10-05", {"steps": 100}, {}, {}, "key-2"))[0] is True
+
+    assert run(wellness.get_by_date("u1", "2026-10-05"))["steps"] == 200
+
+
+def test_wellness_update_returns_before_image(fresh_storage):
+    wellness = fresh_storage.wellness
+    log_id = run(wellness.create({"user_id": "u1", "date": "2026-10-05", "steps": 1000, "mood": "good"}))
+
+    before = run(wellness.update(log_id, "u1", {"steps": 3000}))
+    assert before["steps"] == 1000
+    assert run(wellness.get_by_date("u1", "2026-10-05"))["steps"] == 3000
+    assert run(wellness.update(log_id, "someone-else", {"steps": 1})) is None
+
+
+def test_wellness_create_rejects_second_log_for_a_day(fresh_storage):
+    wellness = fresh_storage.wellness
+
+    assert run(wellness.create({"user_id": "u1", "date": "2026-10-05", "steps": 1})) is not None
+    assert run(wellness.create({"user_id": "u1", "date": "2026-10-05", "steps": 2})) is None
+    assert run(wellness.create({"user_id": "u2", "date": "2026-10-05", "steps": 3})) is not None
+
+
+def test_list_for_user_projects_requested_fields(fresh_storage):
+    run(fresh_storage.wellness.create({"user_id": "u1", "date": "2026-10-05", "steps": 1, "mood": "good", "notes": "x"}))
+    run(fresh_storage.habits.create({"user_id": "u1", "name": "Run", "frequency": "daily", "created_at": datetime(2026, 1, 1)}))
+
+    [log] = run(fresh_storage.wellness.list_for_user("u1", fields=["date", "steps"]))
+    assert set(log) == {"_id", "date", "steps"}
+    [habit] = run(fresh_storage.habits.list_for_user("u1", ["name", "created_at"]))
+    assert set(habit) == {"_id", "name", "created_at"}
+
+
+def test_ingest_claim_lease(fresh_storage):
+    keys = fresh_storage.ingest_keys
+
+    assert run(keys.claim("u1", "k", 600)) == (True, None)
+    claimed, previous = run(keys.claim("u1", "k", 600))
+    assert claimed is False and previous["status"] == "pending"
+
+    run(keys.fail("u1", "k"))
+    assert run(keys.claim("u1", "k", 600))[0] is True
+
+    # A pending claim whose lease ran out belongs to a process that died
+    keys.keys[("u1", "k")]["lease_until"] = datetime.utcnow() - timedelta(seconds=1)
+    assert run(keys.claim("u1", "k", 600))[0] is True
+
+    run(keys.finish("u1", "k", {"accepted": 1}))
+    claimed, previous = run(keys.claim("u1", "k", 600))
+    assert claimed is False and previous["result"] == {"accepted": 1}
@@ -0,0 +1,130 @@
+import json
+from datetime import datetime, timedelta
+from app.storage import storage
+from app.utils.cleanup import collect_garbage
+
+
+def samples(*lines) -> bytes:
+    return "".join(json.dumps(line) + "\n" for line in lines).encode()
+
+
+def create_habit(client, name="Run"):
+    return client.post("/habits/", json={"name": name, "frequency": "daily"}).json()["id"]
+
+
+def test_habit_can_be_logged_once_a_day(client):
+    habit_id = create_habit(client)
+
+    assert client.post(f"/habits/{habit_id}/log").status_code == 200
+    assert client.post(f"/habits/{habit_id}/log").status_code == 400
+    assert client.get("/analytics/summary").json()["habits_completed_today"] == 1
+
+
+def test_one_wellness_log_per_day(client):
+    log = {"sleep_hours": 8, "water_intake_liters": 2, "steps": 4000, "mood": "good"}
+
+    assert client.post("/wellness/logs/", json=log).status_code == 200
+    assert client.post("/wellness/logs/", json=log).status_code == 400
+
+
+def test_ingest_retry_with_same_key_is_not_counted_twice(client):
+    now = datetime.utcnow().replace(microsecond=0)
+    body = samples(
+        {"timestamp": now.isoformat(), "type": "steps", "value": 500},
+        {"timestamp": now.isoformat(), "type": "water", "value": 1.5},
+        {"timestamp": (now + timedelta(days=2)).isoformat(), "type": "steps", "value": 500},
+    ) + b"not json\n"
+
+    first = client.post("/wellness/logs/ingest", content=body, headers={"Idempotency-Key": "upload-1"}).json()
+    assert (first["accepted"], first["rejected"], first["duplicate"]) == (2, 2, False)
+
+    again = client.post("/wellness/logs/ingest", content=body, headers={"Idempotency-Key": "upload-1"}).json()
+    assert again["duplicate"] is True
+
+    [log] = client.get("/wellness/logs/").json()
+    assert log["steps"] == 500
+    assert log["water_intake_liters"] == 1.5
+    assert log["sleep_hours"] is None
+
+
+def test_ingest_rejects_overlong_line(client):
+    response = client.post("/wellness/logs/ingest", content=b"x" * 10000)
+    assert response.status_code == 413
+
+
+def test_ingest_counts_deeply_nested_line_as_rejected(client):
+    body = b"[" * 2000 + b"\n" + b"{" * 2000 + b"\n"
+
+    response = client.post("/wellness/logs/ingest", content=body, headers={"Idempotency-Key": "nested"})
+    assert response.status_code == 200
+    assert (response.json()["accepted"], response.json()["rejected"]) == (0, 2)
+    assert client.post("/wellness/logs/ingest", content=body, headers={"Idempotency-Key": "nested"}).json()["duplicate"] is True
+
+
+def test_reminder_target_must_be_users_habit(client):
+    reminder = {"title": "Go run", "reminder_type": "habit", "reminder_time": "2030-01-01T08:00:00"}
+
+    assert client.post("/reminders/", json={**reminder, "target_id": "not-an-id"}).status_code == 400
+    assert client.post("/reminders/", json={**reminder, "target_id": "64fa1234567890abcdef1234"}).status_code == 404
+    assert client.post("/reminders/", json={**reminder, "target_id": create_habit(client)}).status_code == 200
+
+
+def test_upcoming_merges_repeating_and_one_off(client):
+    habit_id = create_habit(client)
+    base = {"reminder_type": "habit", "target_id": habit_id}
+    client.post("/reminders/", json={**base, "title": "Daily", "reminder_time": "2030-01-01T08:00:00Z", "repeat": "daily"})
+    client.post("/reminders/", json={**base, "title": "Once", "reminder_time": "2030-01-02T09:00:00Z"})
+
+    upcoming = client.get("/reminders/upcoming", params={"from": "2030-01-01T00:00:00Z", "limit": 4}).json()
+    assert [(item["title"], item["fire_at"][:16]) for item in upcoming] == [
+        ("Daily", "2030-01-01T08:00"),
+        ("Daily", "2030-01-02T08:00"),
+        ("Once", "2030-01-02T09:00"),
+        ("Daily", "2030-01-03T08:00"),
+    ]
+
+
+def test_orphan_sweep_keeps_unverified_targets(client):
+    habit_id = create_habit(client)
+    base = {"title": "Go run", "reminder_time": "2030-01-01T08:00:00"}
+    client.post("/reminders/", json={**base, "reminder_type": "habit", "target_id": habit_id})
+    client.post("/reminders/", json={**base, "reminder_type": "wellness", "target_id": "hydration"})
+
+    # Delete the habit behind the routes' back so only the sweep can clean up after it
+    client.portal.call(storage.habits.delete, habit_id, client.user_id)
+    assert client.portal.call(collect_garbage)["orphan_habits"] == 1
+
+    [left] = client.get("/reminders/").json()
+    assert left["target_id"] == "hydration"
+
+
+def test_upcoming_window_in_the_past_still_expands_repeating(client):
+    habit_id = create_habit(client)
+    anchor = (datetime.utcnow() - timedelta(days=100)).replace(hour=8, minute=0, second=0, microsecond=0)
+    base = {"reminder_type": "habit", "target_id": habit_id}
+    client.post("/reminders/", json={**base, "title": "Daily", "reminder_time": anchor.isoformat() + "Z", "repeat": "daily"})
+    client.post("/reminders/", json={**base, "title": "Once", "reminder_time": (anchor + timedelta(days=5, hours=1)).isoformat() + "Z"})
+
+    window = {"from": (anchor + timedelta(days=4)).isoformat() + "Z", "to": (anchor + timedelta(days=6)).isoformat() + "Z"}
+    upcoming = client.get("/reminders/upcoming", params=window).json()
+    assert [(item["title"], item["fire_at"][:13]) for item in upcoming] == [
+        ("Daily", (anchor + timedelta(days=4)).isoformat()[:13]),
+        ("Daily", (anchor + timedelta(days=5)).isoformat()[:13]),
+        ("Once", (anchor + timedelta(days=5, hours=1)).isoformat()[:13]),
+        ("Daily", (anchor + timedelta(days=6)).isoformat()[:13]),
+    ]
+
+
+def test_orphan_sweep_purges_a_batch_of_habits_from_caches(client):
+    kept, gone_a, gone_b = (create_habit(client, name) for name in ("Read", "Swim", "Lift"))
+    for habit_id in (gone_a, gone_b):
+        client.post(f"/habits/{habit_id}/log")
+        client.portal.call(storage.habits.delete, habit_id, client.user_id)
+    stats = {habit_id: {"completed_days": 1} for habit_id in (kept, gone_a, gone_b)}
+    client.portal.call(storage.analytics_cache.save, client.user_id, stats, "2026-10-01")
+    client.portal.call(storage.analytics_cache.save, "other-user", {"x": {"completed_days": 2}}, "2026-10-01")
+
+    assert client.portal.call(collect_garbage)["orphan_habits"] == 2
+    assert list(client.portal.call(storage.analytics_cache.get, client.user_id)["stats"]) == [kept]
+    assert client.portal.call(storage.analytics_cache.get, "other-user")["stats"] == {"x": {"completed_days": 2}}
+    assert client.portal.call(storage.habit_logs.buckets_for_user, client.user_id) == []